@@ -0,0 +1,66 @@
+# -*- coding: utf-8 -*-
+
+# d3Launcher, a Doom3/dhewm3 Launcher
+# Copyright (C) <2021~>  <Dimitrios Koukas>
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Config format benchmark: times store and load of the settings with many
+# custom launchers, the old pickle dump against the versioned format (with
+# the launchers section decoded lazily, and forced).
+#
+#   python bench/conf_format.py [custom launchers] [rounds]
+
+import os, sys, time, _pickle as cPickle
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.conf import conf
+from lib.store import dumpConf, loadConf
+
+
+def makeConf(launchers):
+    """Settings holding the given number of custom launchers."""
+    settings = dict(conf)
+    settings['custom.launchers'] = {' Custom mod %05d' % x: ['dhewm3.exe +set fs_game mod%05d +set com_allowConsole 1' % x,
+        'dhewm3ded.exe +set fs_game mod%05d +set net_serverDedicated 1' % x] for x in range(launchers)}
+    settings['launch.exclusions'] = [' Custom mod %05d' % x for x in range(0, launchers, 10)]
+    return settings
+
+
+def timed(func, rounds):
+    """Best time of a call over some rounds."""
+    best = None
+    for x in range(rounds):
+        start = time.perf_counter()
+        result = func()
+        best = min(best or 1e9, time.perf_counter()-start)
+    return best, result
+
+
+def main(launchers=10000, rounds=5):
+    """Bootstrap."""
+    settings = makeConf(launchers)
+    pklStore, pkl = timed(lambda: cPickle.dumps(settings), rounds)
+    pklLoad = timed(lambda: cPickle.loads(pkl), rounds)[0]
+    cfgStore, cfg = timed(lambda: dumpConf(settings), rounds)
+    cfgLoad, loaded = timed(lambda: loadConf(cfg), rounds)
+    cfgRestore = timed(lambda: dumpConf(loadConf(cfg)), rounds)[0]
+    cfgFull = timed(lambda: len(loadConf(cfg)['custom.launchers']), rounds)[0]
+    print('%s custom launchers, best of %s' % (launchers, rounds))
+    print('pickle:  store %.2fms, load %.2fms (%s bytes)' % (pklStore*1000, pklLoad*1000, len(pkl)))
+    print('cfg:     store %.2fms, load %.2fms lazy, %.2fms decoded (%s bytes)' % (cfgStore*1000, cfgLoad*1000, cfgFull*1000, len(cfg)))
+    print('cfg:     load+store untouched %.2fms' % (cfgRestore*1000))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:3]])
@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+# d3Launcher, a Doom3/dhewm3 Launcher
+# Copyright (C) <2021~>  <Dimitrios Koukas>
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Idle wakeups benchmark: starts the launcher, lets it settle, then counts
+# the context switches of all its threads while nobody touches it. Uses
+# psutil if installed, /proc otherwise (Linux).
+#
+#   python bench/idle_wakeups.py [settle seconds] [sample seconds]
+
+import os, sys, glob, time, subprocess
+try: import psutil
+except ImportError: psutil = None
+
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'd3launcher.py')
+
+
+def switches(pid):
+    """Context switches so far of all threads of a process."""
+    if psutil is not None: return sum(psutil.Process(pid).num_ctx_switches())
+    total = 0
+    for status in glob.glob('/proc/%s/task/*/status' % pid):
+        with open(status) as inp:
+            total += sum([int(x.split()[1]) for x in inp if 'ctxt_switches' in x])
+    return total
+
+
+def main(settle=10.0, sample=30.0):
+    """Bootstrap."""
+    proc = subprocess.Popen([sys.executable, APP])
+    try:
+        time.sleep(settle)
+        if proc.poll() is not None: return print('The launcher exited early (%s)' % proc.returncode)
+        start = switches(proc.pid)
+        time.sleep(sample)
+        print('idle wakeups: %.1f/s over %ss' % ((switches(proc.pid)-start)/sample, sample))
+    finally: proc.terminate()
+
+
+if __name__ == '__main__':
+    main(*[float(x) for x in sys.argv[1:3]])
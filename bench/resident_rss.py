@@ -0,0 +1,55 @@
+# -*- coding: utf-8 -*-
+
+# d3Launcher, a Doom3/dhewm3 Launcher
+# Copyright (C) <2021~>  <Dimitrios Koukas>
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Resident mode benchmark: RSS of a warm catalog with many scanned launchers
+# (list, search and Add/Edit dialog indexes built), then after hiding to the
+# tray drops what is rebuilt on demand, and the time the hidden state takes
+# to show the list again. Only the catalog is measured: the launcher itself
+# shows its memory with the window shown and hidden to the tray, and its
+# startup and first scan times, in the About tab.
+#
+#   python bench/resident_rss.py [launchers]
+
+import os, sys, time
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.mem import rss, trim
+from type_ahead import makeCatalog
+
+
+def main(launchers=10000):
+    """Bootstrap."""
+    start = rss()
+    catalog = makeCatalog(launchers)[0]
+    catalog.find('doom')
+    catalog.iterScanned('doom')  # What an Add/Edit dialog leaves behind
+    trim()
+    shown = rss()
+    catalog.trim()
+    trim()
+    hidden = rss()
+    begin = time.perf_counter()
+    catalog.titles()
+    catalog.find('doom')
+    back = time.perf_counter()-begin
+    print('%s launchers, RSS: %.1fMB at start' % (launchers, start/2**20))
+    print('shown:  %.1fMB' % (shown/2**20))
+    print('hidden: %.1fMB (%.1fMB dropped), list and search back in %.2fms' % (hidden/2**20, (shown-hidden)/2**20, back*1000))
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:2]])
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+
+# d3Launcher, a Doom3/dhewm3 Launcher
+# Copyright (C) <2021~>  <Dimitrios Koukas>
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Scan benchmark: simulates a high-latency (SMB/NFS) filesystem by delaying
+# every directory listing, stat call and script read, then times a cold mod
+# scan serially and on the thread pool.
+#
+#   python bench/scan_latency.py [mod dirs] [latency ms] [workers]
+
+import os, sys, time, tempfile, shutil
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.conf import defs
+import lib.scan as scan
+
+
+def makeTree(root, mods):
+    """Create a fake game dir with mod dirs holding a launch script each."""
+    [os.mkdir(os.path.join(root, x)) for x in ('base', 'd3xp')]
+    open(os.path.join(root, 'dhewm3.exe'), 'w').close()
+    for x in range(mods):
+        modDir = os.path.join(root, 'mod%04d' % x)
+        os.mkdir(modDir)
+        with open(os.path.join(modDir, 'mod%04d.bat' % x), 'w') as out:
+            out.write('dhewm3.exe +set fs_game mod%04d\n' % x)
+
+
+def slow(func, latency):
+    """Wrap a filesystem call with a fixed delay."""
+    def wrapper(*args, **kwargs):
+        time.sleep(latency)
+        return func(*args, **kwargs)
+    return wrapper
+
+
+def parser(fpath, latency=0):
+    """Minimal launch script parser (one read per script)."""
+    time.sleep(latency)
+    with open(fpath) as inp:
+        return [x.strip() for x in inp if '.exe' in x]
+
+
+def run(root, workers, latency):
+    """Time a cold scan with the given worker count."""
+    engine = scan.scanEngine(None, workers=workers, timeout=60)
+    engine.entrySig = slow(engine.entrySig, latency)
+    start = time.perf_counter()
+    result = engine.scan(root, lambda x: parser(x, latency))
+    return time.perf_counter()-start, len(result.launchers), str(engine.stats)
+
+
+def main(mods=200, latency=5.0, workers=8):
+    """Bootstrap."""
+    defs.update({'game.exe': 'dhewm3.exe', 'game.server': 'dhewm3ded.exe'})
+    root = tempfile.mkdtemp()
+    try:
+        makeTree(root, mods)
+        scan.os.scandir = slow(os.scandir, latency/1000.0)
+        serial = run(root, 1, latency/1000.0)
+        pooled = run(root, workers, latency/1000.0)
+        print('%s mod dirs, %sms per listing/stat/read' % (mods, latency))
+        print('serial:   %.3fs (%s dirs, %s)' % serial)
+        print('%s workers: %.3fs (%s dirs, %s)' % ((workers,)+pooled))
+        print('speedup:  %.1fx' % (serial[0]/pooled[0]))
+    finally: shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main(*[float(x) if n == 1 else int(x) for n, x in enumerate(sys.argv[1:4])])
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+
+# d3Launcher, a Doom3/dhewm3 Launcher
+# Copyright (C) <2021~>  <Dimitrios Koukas>
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Launch script parser benchmark: checks known batch lines against the
+# command lines they compile to, then times parsing many generated mod
+# scripts.
+#
+#   python bench/script_parse.py [scripts]
+
+import os, sys, time, tempfile, shutil
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.scripts import parseScript
+
+EXES = {'dhewm3.exe': 'dhewm3.exe', 'dhewm3': 'dhewm3.exe', 'dhewm3ded.exe': 'dhewm3ded.exe'}
+CASES = (  # Batch line: game command lines
+    ('dhewm3.exe +set fs_game sikkmod', ['dhewm3.exe +set fs_game sikkmod']),
+    ('start "" /d "%~dp0" dhewm3 +set fs_game "lost mission"', ['dhewm3.exe +set fs_game "lost mission"']),
+    ('dhewm3.exe +x 2>nul', ['dhewm3.exe +x']),
+    ('dhewm3.exe +x >nul 2>&1', ['dhewm3.exe +x']),
+    ('dhewm3.exe +x 1>>log.txt 2>&1 & dhewm3ded.exe +y', ['dhewm3.exe +x', 'dhewm3ded.exe +y']),
+    ('dhewm3.exe +x <in.txt && echo done', ['dhewm3.exe +x']),
+    ('dhewm3.exe +set r_mode 12>out.txt', ['dhewm3.exe +set r_mode 12']),
+    ('dhewm3.exe +set com_showFPS "2">out.txt', ['dhewm3.exe +set com_showFPS 2']),
+    ('dhewm3.exe +set fs_game ^&mod', ['dhewm3.exe +set fs_game &mod']),
+)
+
+
+def parse(root, name, text):
+    """Write a batch file and parse it to command lines."""
+    fpath = os.path.join(root, name)
+    with open(fpath, 'w') as out:
+        out.write(text)
+    return [x.line() for x in parseScript(fpath, EXES)]
+
+
+def check(root):
+    """Compare the known cases with what they compile to."""
+    for line, expected in CASES:
+        found = parse(root, 'case.bat', '@echo off\n%s\n' % line)
+        assert found == expected, '%r: %r, expected %r' % (line, found, expected)
+    print('%s known lines: ok' % len(CASES))
+
+
+def main(scripts=2000):
+    """Bootstrap."""
+    root = tempfile.mkdtemp()
+    try:
+        check(root)
+        for x in range(scripts):
+            with open(os.path.join(root, 'mod%04d.bat' % x), 'w') as out:
+                out.write('@echo off\nrem mod %04d\nset MOD=mod%04d\ncd /d "%%~dp0"\n' % (x, x))
+                out.write('start "" dhewm3.exe +set fs_game %MOD% +set com_allowConsole 1 >nul 2>&1\n')
+        start = time.perf_counter()
+        [parseScript(os.path.join(root, 'mod%04d.bat' % x), EXES) for x in range(scripts)]
+        print('%s scripts parsed in %.2fms' % (scripts, (time.perf_counter()-start)*1000))
+    finally: shutil.rmtree(root)
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:2]])
@@ -0,0 +1,87 @@
+# -*- coding: utf-8 -*-
+
+# d3Launcher, a Doom3/dhewm3 Launcher
+# Copyright (C) <2021~>  <Dimitrios Koukas>
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Type-ahead benchmark: times the main list filter of a catalog with many
+# scanned launchers, one query per keystroke, against a plain scan of all
+# titles.
+#
+#   python bench/type_ahead.py [launchers] [rounds]
+
+import os, sys, time, random
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from lib.conf import defs
+from lib.catalog import launcherCatalog
+
+WORDS = ('doom', 'hell', 'mars', 'base', 'classic', 'sikkmod', 'perfected', 'phobos', 'lost', 'mission', 'arena', 'ctf', 'dark')
+TYPED = ('classic doom', 'sikk', 'mod0', 'mod01234', 'hell')
+
+
+def makeCatalog(launchers):
+    """Catalog holding the given number of scanned launchers."""
+    defs.update({'game.dir': os.path.join(os.sep, 'game'), 'game.exe': 'dhewm3.exe', 'game.server': 'dhewm3ded.exe'})
+    random.seed(launchers)
+    titles = [' %s %s %05d' % (random.choice(WORDS).title(), random.choice(WORDS), x) for x in range(launchers)]
+    catalog = launcherCatalog()
+    start = time.perf_counter()
+    catalog.setScanned({x: ['dhewm3.exe +set fs_game mod%05d' % n] for n, x in enumerate(titles)},
+        {x: os.path.join(defs['game.dir'], 'mod%05d' % n) for n, x in enumerate(titles)})
+    catalog.titles()
+    return catalog, time.perf_counter()-start
+
+
+def scan(catalog, query):
+    """Filter without indexes."""
+    query = query.strip().casefold()
+    return [x for x in catalog.titles() if query in x.casefold() or query in os.path.basename(catalog[x].source).casefold()]
+
+
+def timed(func, keys, rounds):
+    """Worst keystroke (best of some rounds) of a filter over typed queries."""
+    worst = 0
+    for text in keys:
+        for end in range(1, len(text)+1):
+            best = None
+            for x in range(rounds):
+                start = time.perf_counter()
+                func(text[:end])
+                best = min(best or 1e9, time.perf_counter()-start)
+            worst = max(worst, best)
+    return worst
+
+
+def main(launchers=10000, rounds=5):
+    """Bootstrap."""
+    catalog, build = makeCatalog(launchers)
+    print('%s launchers, indexed in %.2fms, worst keystroke of %s, best of %s' % (launchers, build*1000, TYPED, rounds))
+    print('indexed: %.2fms' % (timed(catalog.find, TYPED, rounds)*1000))
+    print('scan:    %.2fms' % (timed(lambda query: scan(catalog, query), TYPED, rounds)*1000))
+    start = time.perf_counter()
+    catalog.apply(('put', 'custom.launchers', ' Classic doom custom', ['dhewm3.exe']))
+    print('incremental add %.3fms, found: %s' % ((time.perf_counter()-start)*1000, ' Classic doom custom' in catalog.find('classic doom cu')))
+    hidden = catalog.titles()[0]
+    catalog.apply(('add', 'launch.exclusions', hidden))
+    listed = catalog.find('')
+    assert ' Classic doom custom' in listed and hidden not in listed and listed == sorted(catalog.byName), 'stale list'
+    assert hidden not in catalog.find(hidden) and ' Classic doom custom' in catalog.find('classic'), 'stale search'
+    catalog.apply(('rm', 'launch.exclusions', hidden))
+    assert hidden in catalog.find(''), 'stale list'
+    print('list and search follow settings changes: ok')
+
+
+if __name__ == '__main__':
+    main(*[int(x) for x in sys.argv[1:3]])
@@ -21,15 +21,22 @@
 
 # Main
 
-import wx, os, subprocess, shutil, _pickle as cPickle, locale, wx.adv as adv
+import wx, os, time, json, threading, subprocess, hashlib, locale, wx.adv as adv
 import lib.singletons as singletons, lib.images as images
+from lib.scan import scanIndex, scanEngine, signature
+from lib.scripts import parseScript, scriptSkip
+from lib.catalog import launcherCatalog
+from lib.watch import dirWatcher, journalWatcher
+from lib.mem import rss, trim
+from lib.store import debouncedWriter, atomicWrite, fileHash, dumpConf, loadConf, loadLegacy, confJournal, applyOp, fileLock, sameValue
 import wx.lib.agw.gradientbutton as GB
 from lib.conf import APPNAME, APPDIR, APPVER, DPOS, DSIZE, SPC, conf, cache, defs, creds
 
 
-def CreateBitmap(imgName):
-    """Return embeded image."""
-    return images.catalog[imgName].Bitmap
+def CreateBitmap(imgName, bitmaps={}):
+    """Return embeded image (decoded once)."""
+    if imgName not in bitmaps: bitmaps[imgName] = images.catalog[imgName].Bitmap
+    return bitmaps[imgName]
 
 
 def setIcon(parent, image=None):
@@ -48,42 +55,118 @@ class confLib:
 
     def __init__(self):
         """Init."""
-        confFile = '%s.pkl' % APPNAME
+        confFile = '%s.cfg' % APPNAME
         self.confFile = os.path.join(APPDIR, confFile)
+        self.legacyFile = os.path.join(APPDIR, '%s.pkl' % APPNAME)
+        self.defaults = json.dumps(conf)
+        self.lock = fileLock(self.confFile+'.lock')
+        self.writer = debouncedWriter(self.confFile, defs['conf.delay'], defs['conf.durability'], self.lock)
+        self.journal = confJournal(self.confFile+'.log', self.lock, defs['conf.durability'])
+        self.watcher = None
+
+    def backups(self):
+        """Backup generations, newest first."""
+        return [self.confFile+'.bck']+['%s.bck%s' % (self.confFile, x) for x in range(1, max(defs['conf.backups'], 1))]
 
     def bckConf(self):
-        """Backup configuration file."""
-        shutil.copyfile(self.confFile, self.confFile+'.bck')
+        """Backup configuration file, rotating generations, only if it differs from the newest backup."""
+        with open(self.confFile, 'rb') as inp:
+            data = inp.read()
+        backups = self.backups()
+        if fileHash(backups[0]) == hashlib.sha1(data).digest(): return
+        for src, dst in reversed(list(zip(backups, backups[1:]))):
+            if os.path.isfile(src): os.replace(src, dst)
+        atomicWrite(backups[0], data, False)
 
     def restoreBck(self):
-        """Restore backup configuration file."""
-        if os.path.isfile(self.confFile+'.bck'):  # Try to restore backup conf
-            if os.path.isfile(self.confFile): os.remove(self.confFile)
-            shutil.copyfile(self.confFile+'.bck', self.confFile)
-            try:
-                self.fRestore()
-                return
-            except: pass
+        """Restore the newest backup configuration file that loads."""
+        for bck in self.backups():
+            if not os.path.isfile(bck): continue
+            try: self.fRestore(bck)
+            except: continue
+            self.save()
+            return True
+        return False
+
+    def record(self, *op):
+        """Apply and journal a settings change, compacting the journal past its threshold."""
+        applyOp(conf, op)
+        if singletons.catalog is not None: singletons.catalog.apply(op)
+        self.journal.append(op)
+        if self.writer.pending is None and self.journal.size() > defs['conf.journal']: self.store()
 
     def store(self):
-        """Save altered settings."""
-        with open(self.confFile, 'wb') as out:
-            cPickle.dump(conf, out)
-
-    def fRestore(self):
+        """Fold the journal into the settings snapshot (coalesced, in the background)."""
+        self.writer.write(self.fold, self.journal.reset)
+
+    def save(self):
+        """Write the settings in memory as the snapshot now."""
+        with self.lock:
+            self.sync()
+            self.writer.write(dumpConf(conf), self.journal.reset)
+            self.writer.flush()
+
+    def flush(self):
+        """Write pending settings now."""
+        self.writer.flush()
+        self.journal.flush()
+
+    def load(self, confFile=None, track=True):
+        """Read the settings on disk: defaults, then the snapshot (if any), then the journal."""
+        raw = json.loads(self.defaults)
+        with self.lock:
+            if confFile is not None or os.path.isfile(self.confFile):
+                with open(confFile or self.confFile, 'rb') as inp:
+                    raw.update(loadConf(inp.read()))
+            self.journal.replay(raw, track)
+        return raw
+
+    def fold(self):
+        """Encode the settings on disk as a new snapshot (by whichever instance, under the lock)."""
+        return dumpConf(self.load(track=False))
+
+    def sync(self):
+        """Apply changes made by other instances since the last sync, returning the changed keys."""
+        with self.lock:
+            ops = self.journal.read()
+            if ops is not None: return self.journal.apply(conf, ops)
+            raw = self.load()  # Compacted meanwhile: compare with the new snapshot
+        keys = {x for x in raw if x not in conf or not sameValue(raw[x], conf[x])}
+        conf.update({x: raw[x] for x in keys})
+        return keys
+
+    def watch(self, onChange):
+        """Report settings changes by other instances."""
+        self.watcher = journalWatcher(self.journal, onChange, defs['conf.poll'])
+        self.watcher.start()
+
+    def fRestore(self, confFile=None):
         """Parse saved settings."""
-        with open(self.confFile, 'rb') as inp:
-            self.raw = cPickle.load(inp)
-        # Apply settings
-        for x in self.raw:
-            conf[x] = self.raw[x]
-        # Backup conf
-        self.bckConf()
+        with self.lock:
+            self.raw = self.load(confFile)
+            # Apply settings
+            conf.update(self.raw)
+
+    def migrate(self):
+        """Convert the old pickled settings to the current format."""
+        try: conf.update(loadLegacy(self.legacyFile))
+        except: return
+        self.save()
 
     def restore(self):
         """Restore saved settings."""
-        try: self.fRestore()
-        except: pass
+        with self.lock:
+            if not os.path.isfile(self.confFile) and os.path.isfile(self.legacyFile): return self.migrate()
+            try: self.fRestore()
+            except:  # Damaged snapshot
+                if self.restoreBck(): return
+                self.journal.replay(conf)
+                self.save()
+                return
+            # Backup conf (a failed backup must not discard the good snapshot)
+            try:
+                if os.path.isfile(self.confFile): self.bckConf()
+            except OSError: pass
 
 
 class confDialog(wx.Dialog):
@@ -94,10 +177,9 @@ class confDialog(wx.Dialog):
         wx.Dialog.__init__(self, parent, id=wx.ID_ANY, title=title, pos=DPOS, size=(-1, -1), style=style)
         self.SetSizeHints(wx.Size(257, 354), DSIZE)
         setIcon(self)
-        self.timer = wx.Timer()
         # Content
         self.exclList = wx.CheckListBox(self, wx.ID_ANY,
-            DPOS, (220, 340), conf['launch.exclusions'], wx.LB_EXTENDED|wx.LB_NEEDED_SB|wx.LB_SORT|wx.NO_BORDER)
+            DPOS, (220, 340), singletons.catalog.excludedTitles(), wx.LB_EXTENDED|wx.LB_NEEDED_SB|wx.LB_SORT|wx.NO_BORDER)
         self.resBtn = GB.GradientButton(self, wx.ID_OK, None, 'Restore Selected Items', size=(130, 20))
         self.cnlBtn = GB.GradientButton(self, wx.ID_CANCEL, None, 'Cancel', size=(65, 20))
         # Theming
@@ -113,28 +195,27 @@ class confDialog(wx.Dialog):
         mainSizer.Fit(self)
         self.Centre(wx.BOTH)
         # Events
-        self.timer.Bind(wx.EVT_TIMER, self.onUpdate)
         self.Bind(wx.EVT_CLOSE, self.onClose)
-        self.timer.Start(50)
+        self.exclList.Bind(wx.EVT_CHECKLISTBOX, self.onCheck)
         self.resBtn.Bind(wx.EVT_BUTTON, self.onRestore)
         self.cnlBtn.Bind(wx.EVT_BUTTON, self.onClose)
+        # Init
+        self.onCheck()
 
-    def onUpdate(self, event):
-        """Timed events."""
-        if not self.exclList.GetCheckedStrings():
+    def onCheck(self, event=None):
+        """Offer restoring only when items are checked."""
+        if not self.exclList.GetCheckedItems():
             if self.resBtn.IsShown(): self.resBtn.Hide()
         else:
             if not self.resBtn.IsShown(): self.resBtn.Show()
 
     def onRestore(self, event):
         """On restoring excluded items."""
-        conf['launch.exclusions'] = [x for x in conf['launch.exclusions'] if x not in self.exclList.GetCheckedStrings()]
-        singletons.confLib.store()
+        [singletons.confLib.record('rm', 'launch.exclusions', x) for x in self.exclList.GetCheckedStrings()]
         self.onClose()
 
     def onClose(self, event=None):
         """Exit actions."""
-        self.timer.Stop()
         self.Hide()
         self.Destroy()
 
@@ -147,13 +228,15 @@ class addDialog(wx.Dialog):
         wx.Dialog.__init__(self, parent, id=wx.ID_ANY, title=title, pos=DPOS, size=(-1, -1), style=style)
         self.SetSizeHints(wx.Size(460, 550), DSIZE)
         setIcon(self)
-        self.timer = wx.Timer()
         # Content
         sampleBox = wx.StaticBox(self, wx.ID_ANY, 'Existing Launchers (feel free to copy):')
         titleBox = wx.StaticBox(self, wx.ID_ANY, 'Title:')
         cmdBox = wx.StaticBox(self, wx.ID_ANY, 'Command (for multiple commands, separate with a new line):')
-        self.sample = wx.TextCtrl(sampleBox, wx.ID_ANY, '', DPOS, DSIZE, wx.TE_DONTWRAP|wx.TE_MULTILINE|wx.TE_READONLY|wx.TE_RICH2)
+        self.search = wx.SearchCtrl(sampleBox, wx.ID_ANY, '', DPOS, DSIZE, wx.NO_BORDER)
+        self.search.ShowCancelButton(True)
+        self.sample = sampleList(sampleBox)
         self.setSample()
+        self.copyBtn = GB.GradientButton(sampleBox, wx.ID_ANY, None, 'Copy to Command', size=(110, 20))
         self.title = wx.TextCtrl(titleBox, wx.ID_ANY, '', DPOS, DSIZE, 0|wx.NO_BORDER)
         self.cmds = wx.TextCtrl(cmdBox, wx.ID_ANY, '', DPOS, DSIZE, wx.TE_DONTWRAP|wx.TE_MULTILINE|wx.NO_BORDER)
         self.chkEdit(edit)
@@ -164,13 +247,15 @@ class addDialog(wx.Dialog):
         self.SetForegroundColour(wx.Colour(240, 240, 240))
         self.SetBackgroundColour(wx.Colour(64, 64, 64))
         self.sample.SetBackgroundColour(wx.Colour(140, 140, 140))
+        self.search.SetBackgroundColour(wx.Colour(140, 140, 140))
         [x.SetForegroundColour(wx.Colour(255, 255, 255)) for x in (self.title, self.cmds)]
         [x.SetBackgroundColour(wx.Colour(48, 48, 48)) for x in (self.title, self.cmds)]
         # Layout
         self.cmds.SetMinSize(wx.Size(-1, 60))
         self.sample.SetMinSize(wx.Size(650, 300))
         sampleSizer = wx.StaticBoxSizer(sampleBox, wx.VERTICAL)
-        sampleSizer.Add(self.sample, 1, wx.EXPAND, 5)
+        sampleSizer.AddMany([(self.search, 0, wx.EXPAND|wx.BOTTOM, 5), (self.sample, 1, wx.EXPAND, 5),
+            (self.copyBtn, 0, wx.ALIGN_RIGHT|wx.TOP, 5)])
         titleSizer = wx.StaticBoxSizer(titleBox, wx.VERTICAL)
         titleSizer.Add(self.title, 0, wx.EXPAND, 5)
         cmdSizer = wx.StaticBoxSizer(cmdBox, wx.VERTICAL)
@@ -185,20 +270,24 @@ class addDialog(wx.Dialog):
         mainSizer.Fit(self)
         self.Centre(wx.BOTH)
         # Events
-        self.timer.Bind(wx.EVT_TIMER, self.onUpdate)
         self.Bind(wx.EVT_CLOSE, self.onClose)
-        self.timer.Start(50)
+        self.title.Bind(wx.EVT_TEXT, self.onTitle)
+        self.search.Bind(wx.EVT_TEXT, self.onSearch)
+        self.search.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, self.onSearchCancel)
+        self.sample.Bind(wx.EVT_LIST_ITEM_ACTIVATED, self.onCopy)
+        self.copyBtn.Bind(wx.EVT_BUTTON, self.onCopy)
         self.addBtn.Bind(wx.EVT_BUTTON, self.onCustom)
         self.cnlBtn.Bind(wx.EVT_BUTTON, self.onClose)
+        # Init
+        self.onTitle()
 
-    def onUpdate(self, event):
-        """Timed events."""
+    def onTitle(self, event=None):
+        """Validate the title as it is typed (collisions from the catalog's name index)."""
         if not self.title.GetValue().strip():
             if self.addBtn.IsShown(): self.addBtn.Hide()
         else:
             if not self.addBtn.IsShown(): self.addBtn.Show()
-        if '%s%s' % (defs['list.spc'], self.title.GetValue().strip()) in cache['launchers.full'
-            ] or '%s%s' % (defs['list.spc'], self.title.GetValue().strip()) in conf['custom.launchers']:
+        if singletons.catalog.hasTitle('%s%s' % (defs['list.spc'], self.title.GetValue().strip())):
             if self.addBtn.GetLabel() == 'Add Custom Launcher':
                 self.addBtn.SetLabel('Update Launcher')
                 self.addBtn.Refresh()
@@ -214,21 +303,34 @@ class addDialog(wx.Dialog):
             self.cmds.SetValue('\n'.join(edit[1]))
 
     def setSample(self):
-        """Construct Custom Launcher's texts."""
-        self.sample.SetValue('\n'.join(['%s\n%s\n' %
-            (x, '\n'.join(cache['launchers.full'][x])) for x in cache['launchers.full']]))
+        """Show the existing launchers matching the search field."""
+        self.sample.SetLaunchers(singletons.catalog.iterScanned(self.search.GetValue().strip()))
+
+    def onSearch(self, event):
+        """Filter the existing launchers as the search is typed."""
+        self.setSample()
+
+    def onSearchCancel(self, event):
+        """Clear the search."""
+        self.search.SetValue('')
+
+    def onCopy(self, event):
+        """Copy the selected launcher (or command) to the command field."""
+        launcher, cmds = self.sample.GetSelectionCmds()
+        if launcher is None: return
+        if not self.title.GetValue().strip(): self.title.SetValue(launcher.title.strip())
+        current = self.cmds.GetValue().rstrip('\n')
+        self.cmds.SetValue('\n'.join([x for x in [current]+cmds if x]))
 
     def onCustom(self, event):
         """On adding custom items."""
         title = '%s%s' % (defs['list.spc'], self.title.GetValue().strip())
         cmdRaw = [x for x in self.cmds.GetValue().strip().split('\n') if x]
-        conf['custom.launchers'].update({title: cmdRaw})
-        singletons.confLib.store()
+        singletons.confLib.record('put', 'custom.launchers', title, cmdRaw)
         self.onClose()
 
     def onClose(self, event=None):
         """Exit actions."""
-        self.timer.Stop()
         self.Hide()
         self.Destroy()
 
@@ -290,7 +392,7 @@ class aboutDialog(wx.Dialog):
         self.hlpBtn = wx.Button(self, wx.ID_ANY, 'Help', DPOS, DSIZE, wx.BU_EXACTFIT|wx.NO_BORDER, name='Help')
         self.licBtn = wx.Button(self, wx.ID_ANY, 'License', DPOS, DSIZE, wx.BU_EXACTFIT|wx.NO_BORDER, name='License')
         self.mainTxt = wx.TextCtrl(self, wx.ID_ANY, '', DPOS, DSIZE, wx.TE_MULTILINE|wx.TE_READONLY|wx.TE_RICH|wx.NO_BORDER)
-        self.mainTxt.SetValue(creds['About'])
+        self.setContent('About')
         self.authLnk = adv.HyperlinkCtrl(self, wx.ID_ANY, 'Author\'s WebSite', creds['home.url'], DPOS, DSIZE, adv.HL_DEFAULT_STYLE)
         self.gitLnk = adv.HyperlinkCtrl(self, wx.ID_ANY, 'GitHub', creds['GitHub.url'], DPOS, DSIZE, adv.HL_DEFAULT_STYLE)
         self.dmLnk = adv.HyperlinkCtrl(self, wx.ID_ANY, 'dhewm3', creds['dhewm3.url'], DPOS, DSIZE, adv.HL_DEFAULT_STYLE)
@@ -328,7 +430,7 @@ class aboutDialog(wx.Dialog):
             if tab.GetName() == selTab:
                 tab.SetBackgroundColour(wx.Colour(60, 60, 60))
             else: tab.SetBackgroundColour(wx.Colour(80, 80, 80))
-        self.mainTxt.SetValue(creds[selTab])
+        self.setContent(selTab)
 
     def onHovCtrl(self, event):
         """On hovering over text ctrl."""
@@ -336,7 +438,17 @@ class aboutDialog(wx.Dialog):
 
     def setContent(self, field):
         """Set content for text fields."""
-        self.mainTxt.SetValue(creds[field])
+        self.mainTxt.SetValue(creds[field]+self.sessionText() if field == 'About' else creds[field])
+
+    def sessionText(self):
+        """Startup, scan and memory figures of this session."""
+        secs = lambda x: '%.2fs' % x if x is not None else 'n/a'
+        mbs = lambda x: '%.1fMB' % (x/1048576.0) if x is not None else 'n/a'
+        kinds = [len(singletons.catalog.ofKind(x)) for x in ('client', 'server', 'other')]
+        return ('\n    This session:\n    Window shown %s after start, first launchers listed %s after the scan started.\n'
+            '    Launchers listed: %s client, %s server, %s other.\n'
+            '    Memory in use: %s shown, %s hidden to the tray.\n' % (secs(cache['startup.time']), secs(cache['scan.first']),
+            kinds[0], kinds[1], kinds[2], mbs(cache['tray.rss']['shown']), mbs(cache['tray.rss']['hidden'])))
 
     def onClose(self, event):
         """Exit actions."""
@@ -344,6 +456,146 @@ class aboutDialog(wx.Dialog):
         self.Destroy()
 
 
+class launcherList(wx.ListCtrl):
+    """Virtual launcher list, only visible rows are rendered."""
+
+    def __init__(self, parent, items, style=wx.LC_REPORT|wx.LC_VIRTUAL|wx.LC_NO_HEADER|wx.LC_SINGLE_SEL|wx.SIMPLE_BORDER):
+        """Init."""
+        wx.ListCtrl.__init__(self, parent, wx.ID_ANY, DPOS, DSIZE, style)
+        self.InsertColumn(0, '')
+        self.items = []
+        self.pos = {}  # Launcher: row
+        self.SetItems(items)
+        # Events
+        self.Bind(wx.EVT_SIZE, self.onSize)
+
+    def OnGetItemText(self, item, col):
+        """Render a row on demand."""
+        return self.items[item]
+
+    def onSize(self, event):
+        """Fit the single column to the control."""
+        self.SetColumnWidth(0, self.GetClientSize()[0])
+        event.Skip()
+
+    def SetItems(self, items):
+        """Swap in a new launcher list, keeping selection and scroll position."""
+        if items == self.items: return
+        selection = self.GetStringSelection()
+        if selection is not None: self.Select(self.GetFirstSelected(), False)
+        top = self.items[self.GetTopItem()] if self.items else None
+        self.items = items
+        self.pos = {x: n for n, x in enumerate(items)}
+        self.SetItemCount(len(items))
+        if selection in self.pos: self.SetSelection(self.pos[selection])
+        if top in self.pos and self.GetItemCount():
+            self.ScrollList(0, (self.pos[top]-self.GetTopItem())*self.GetItemRect(0).height)
+        self.Refresh()
+
+    def GetItems(self):
+        """Return all launchers."""
+        return self.items
+
+    def GetSelection(self):
+        """Return the selected row or -1."""
+        return self.GetFirstSelected()
+
+    def SetSelection(self, item):
+        """Select and focus a row."""
+        if not 0 <= item < len(self.items): return
+        self.Select(item)
+        self.Focus(item)
+
+    def GetString(self, item):
+        """Return the launcher of a row."""
+        return self.items[item]
+
+    def GetStringSelection(self):
+        """Return the selected launcher or None."""
+        item = self.GetFirstSelected()
+        return self.items[item] if item != -1 else None
+
+    def FindString(self, string):
+        """Return the row of a launcher or -1 (no linear search)."""
+        return self.pos.get(string, wx.NOT_FOUND)
+
+
+class sampleList(wx.ListCtrl):
+    """Virtual launcher/command preview, only visible rows are rendered."""
+
+    def __init__(self, parent, style=wx.LC_REPORT|wx.LC_VIRTUAL|wx.LC_SINGLE_SEL|wx.LC_HRULES|wx.NO_BORDER):
+        """Init."""
+        wx.ListCtrl.__init__(self, parent, wx.ID_ANY, DPOS, DSIZE, style)
+        self.InsertColumn(0, 'Launcher', width=180)
+        self.InsertColumn(1, 'Command')
+        self.rows = []  # (launcher, command number)
+        # Events
+        self.Bind(wx.EVT_SIZE, self.onSize)
+
+    def OnGetItemText(self, item, col):
+        """Render a row on demand: the title on a launcher's first command only."""
+        launcher, num = self.rows[item]
+        if col == 0: return launcher.title.strip() if not num else ''
+        return launcher.cmds[num]
+
+    def onSize(self, event):
+        """Give the command column the remaining width."""
+        self.SetColumnWidth(1, max(self.GetClientSize()[0]-self.GetColumnWidth(0), 100))
+        event.Skip()
+
+    def SetLaunchers(self, launchers):
+        """Show launcher records, a row per command."""
+        self.rows = [(x, num) for x in launchers for num in range(len(x.cmds))]
+        self.SetItemCount(len(self.rows))
+        self.Refresh()
+
+    def GetSelectionCmds(self):
+        """Return the selected launcher and its commands (only the selected one on a command row)."""
+        item = self.GetFirstSelected()
+        if item == -1: return None, []
+        launcher, num = self.rows[item]
+        return launcher, launcher.cmds if not num else [launcher.cmds[num]]
+
+
+class trayIcon(adv.TaskBarIcon):
+    """Tray icon of the resident mode."""
+
+    def __init__(self, frame):
+        """Init."""
+        adv.TaskBarIcon.__init__(self)
+        self.frame = frame
+        appICO = wx.Icon()
+        appICO.CopyFromBitmap(CreateBitmap('appICO'))
+        self.SetIcon(appICO, APPNAME)
+        # Events
+        self.Bind(adv.EVT_TASKBAR_LEFT_UP, self.onShow)
+        self.Bind(wx.EVT_MENU, self.onShow, id=wx.ID_OPEN)
+        self.Bind(wx.EVT_MENU, self.onLaunch, id=wx.ID_EXECUTE)
+        self.Bind(wx.EVT_MENU, self.onQuit, id=wx.ID_EXIT)
+
+    def CreatePopupMenu(self):
+        """Tray menu: show, re-launch the selected launcher, quit."""
+        menu = wx.Menu()
+        menu.Append(wx.ID_OPEN, 'Show %s' % APPNAME)
+        launcher = self.frame.panel.listBox.GetStringSelection()
+        if launcher is not None: menu.Append(wx.ID_EXECUTE, 'Launch%s' % launcher)
+        menu.AppendSeparator()
+        menu.Append(wx.ID_EXIT, 'Quit')
+        return menu
+
+    def onShow(self, event):
+        """Re-show the main window."""
+        self.frame.fromTray()
+
+    def onLaunch(self, event):
+        """Launch the selected launcher without showing the window."""
+        self.frame.launch(event)
+
+    def onQuit(self, event):
+        """Quit from the tray."""
+        self.frame.onClose()
+
+
 class MainPanel(wx.Panel):
     """MainPanel."""
 
@@ -353,31 +605,37 @@ class MainPanel(wx.Panel):
         # Content
         self.confBtn = GB.GradientButton(self, wx.ID_ANY, None, 'Exclusions', size=(65, 15))
         self.abtBtn = GB.GradientButton(self, wx.ID_ANY, None, 'i', size=(15, 15))
-        self.listBoxChoices = self.scanMods()
-        self.listBox = wx.ListBox(self, wx.ID_ANY, DPOS, DSIZE, self.listBoxChoices, wx.LB_SINGLE|wx.SIMPLE_BORDER)
-        origListBoxSize = self.listBox.GetSize()
-        self.listBox.SetSize((origListBoxSize[0]+20, origListBoxSize[1]+20,))
+        self.searchBox = wx.SearchCtrl(self, wx.ID_ANY, '', DPOS, DSIZE, wx.TE_PROCESS_ENTER|wx.SIMPLE_BORDER)
+        self.searchBox.ShowCancelButton(True)
+        self.searchBox.SetDescriptiveText('Type to filter launchers and mod dirs')
+        self.listBoxChoices = self.listMods()
+        self.listBox = launcherList(self, self.listBoxChoices)
         self.addBtn = GB.GradientButton(self, wx.ID_ANY, None, 'Add', size=(30, 15))
         self.scnBtn = GB.GradientButton(self, wx.ID_ANY, None, 'Scan', size=(32, 15))
         self.edtBtn = GB.GradientButton(self, wx.ID_ANY, None, 'Edit', size=(32, 15))
         self.rmBtn = GB.GradientButton(self, wx.ID_ANY, None, 'Hide', size=(42, 15), name='Exclude')
-        self.ipTxt = wx.TextCtrl(self, wx.ID_ANY, conf['connect.ip'], DPOS, DSIZE, wx.TE_CENTRE|wx.SIMPLE_BORDER)
+        self.ipTxt = wx.TextCtrl(self, wx.ID_ANY, conf['connect.ip'], DPOS, DSIZE, wx.TE_CENTRE|wx.SIMPLE_BORDER, name='connect.ip')
         self.ipTxt.SetMaxLength(15)
-        self.portTxt = wx.TextCtrl(self, wx.ID_ANY, conf['connect.port'], DPOS, DSIZE, wx.TE_CENTRE|wx.SIMPLE_BORDER)
+        self.portTxt = wx.TextCtrl(self, wx.ID_ANY, conf['connect.port'], DPOS, DSIZE, wx.TE_CENTRE|wx.SIMPLE_BORDER, name='connect.port')
         self.portTxt.SetMaxLength(5)
-        self.cnctBox = wx.CheckBox(self, wx.ID_ANY, 'Connect on launch?', DPOS, DSIZE, 0)
+        self.cnctBox = wx.CheckBox(self, wx.ID_ANY, 'Connect on launch?', DPOS, DSIZE, 0, name='connect.launch')
         self.cnctBox.SetValue(conf['connect.launch'])
-        self.clsBox = wx.CheckBox(self, wx.ID_ANY, 'Auto-Quit', DPOS, DSIZE, wx.ALIGN_RIGHT)
+        self.clsBox = wx.CheckBox(self, wx.ID_ANY, 'Auto-Quit', DPOS, DSIZE, wx.ALIGN_RIGHT, name='auto.quit')
         self.clsBox.SetValue(conf['auto.quit'])
+        self.trayBox = wx.CheckBox(self, wx.ID_ANY, 'Tray', DPOS, DSIZE, wx.ALIGN_RIGHT, name='tray.resident')
+        self.trayBox.SetValue(conf['tray.resident'])
+        self.trayBox.Enable(adv.TaskBarIcon.IsAvailable())
         self.actBtn = GB.GradientButton(self, wx.ID_ANY, None, 'Launch', size=DSIZE)
         # Theming
         font = wx.Font(9, wx.FONTFAMILY_SWISS, wx.FONTSTYLE_NORMAL, wx.FONTWEIGHT_BOLD, False, 'Arial')
-        [x.SetFont(font) for x in (self.listBox, self.ipTxt, self.portTxt)]
-        [x.SetForegroundColour(wx.Colour(224, 224, 224)) for x in (self.listBox, self.cnctBox, self.clsBox)]
-        [x.SetForegroundColour(wx.Colour(240, 240, 240)) for x in (self.ipTxt, self.portTxt)]
-        [x.SetBackgroundColour(wx.Colour(16, 16, 16)) for x in (self.portTxt, self.listBox, self.ipTxt)]
-        [x.SetBackgroundColour(wx.BLACK) for x in (self.clsBox, self.cnctBox)]
+        [x.SetFont(font) for x in (self.listBox, self.ipTxt, self.portTxt, self.searchBox)]
+        [x.SetForegroundColour(wx.Colour(224, 224, 224)) for x in (self.listBox, self.cnctBox, self.clsBox, self.trayBox)]
+        [x.SetForegroundColour(wx.Colour(240, 240, 240)) for x in (self.ipTxt, self.portTxt, self.searchBox)]
+        [x.SetBackgroundColour(wx.Colour(16, 16, 16)) for x in (self.portTxt, self.listBox, self.ipTxt, self.searchBox)]
+        [x.SetBackgroundColour(wx.BLACK) for x in (self.clsBox, self.cnctBox, self.trayBox)]
         # Layout
+        self.listBox.SetMinSize(wx.Size(300, -1))
+        self.searchBox.SetMinSize(wx.Size(300, -1))
         self.ipTxt.SetMaxSize(wx.Size(120, -1))
         self.portTxt.SetMaxSize(wx.Size(50, -1))
         topSizer = wx.BoxSizer(wx.HORIZONTAL)
@@ -386,10 +644,12 @@ class MainPanel(wx.Panel):
         listBtnSizer.AddMany([(self.addBtn, 0, wx.ALIGN_CENTER_VERTICAL|wx.LEFT, 5), (self.scnBtn, 0, wx.ALIGN_CENTER_VERTICAL|wx.LEFT,
             5), (self.edtBtn, 0, wx.ALIGN_CENTER_VERTICAL|wx.LEFT, 5), (self.rmBtn, 0, wx.ALIGN_CENTER_VERTICAL|wx.LEFT, 5)])
         listSizer = wx.BoxSizer(wx.VERTICAL)
-        listSizer.AddMany([(self.listBox, 1, wx.ALL|wx.ALIGN_CENTER_HORIZONTAL, 5), (listBtnSizer, 0, wx.ALIGN_CENTER_HORIZONTAL, 5)])
+        listSizer.AddMany([(self.searchBox, 0, wx.LEFT|wx.RIGHT|wx.TOP|wx.ALIGN_CENTER_HORIZONTAL, 5), (self.listBox, 1,
+            wx.ALL|wx.ALIGN_CENTER_HORIZONTAL, 5), (listBtnSizer, 0, wx.ALIGN_CENTER_HORIZONTAL, 5)])
         toolSizer = wx.BoxSizer(wx.HORIZONTAL)
         toolSizer.AddMany([(self.ipTxt, 1, wx.ALIGN_CENTER_VERTICAL|wx.ALL, 5), (self.portTxt, 0, wx.ALL|wx.ALIGN_CENTER_VERTICAL, 5),
-            (self.cnctBox, 0, wx.ALIGN_CENTER_VERTICAL|wx.LEFT, 5), SPC, (self.clsBox, 0, wx.ALIGN_CENTER_VERTICAL|wx.RIGHT, 5),
+            (self.cnctBox, 0, wx.ALIGN_CENTER_VERTICAL|wx.LEFT, 5), SPC, (self.trayBox, 0, wx.ALIGN_CENTER_VERTICAL|wx.RIGHT, 5),
+                (self.clsBox, 0, wx.ALIGN_CENTER_VERTICAL|wx.RIGHT, 5),
                 (self.actBtn, 0, wx.ALL|wx.ALIGN_CENTER_VERTICAL, 5)])
         mainSizer = wx.BoxSizer(wx.VERTICAL)
         mainSizer.AddMany([(topSizer, 0, wx.EXPAND, 5), SPC, (listSizer, 1, wx.ALIGN_RIGHT|wx.ALL, 5), (toolSizer, 0, wx.EXPAND, 5)])
@@ -413,41 +673,64 @@ class MainPanel(wx.Panel):
         dc.Clear()
         dc.DrawBitmap(CreateBitmap('background'), 0, 0)
 
-    def parseFile(self, fpath):
-        """Parse a file's contents."""
-        with open(fpath) as inp:
-            return inp.readlines()
-
-    def parseBat(self, fpath):
-        """Encapsulate a batch file contents."""
-        try:
-            return ['%s %s' % (defs['game.exe'] if defs['game.exe'] in x else defs['game.server'
-            ], x.replace("'", '"').split('.exe')[1][1:].strip()) for x in self.parseFile(fpath) if '.exe' in x]
-        except: pass  # By default None
-
-    def scanMods(self):
-        """Scan launcher choices."""
-        if not os.path.isfile(os.path.join(defs['game.dir'], defs['game.exe'])): return []
-        gameEXE = os.path.join(defs['game.dir'], defs['game.exe'])
-        modDirs = [os.path.normpath(os.path.join(defs['game.dir'], x)) for x in os.listdir(
-            defs['game.dir']) if all([os.path.isdir(os.path.join(defs['game.dir'], x)), x not in ('base',
-                'd3xp'), os.path.normpath(os.path.join(defs['game.dir'], x)) != os.path.normpath(APPDIR)])]
+    def gameExes(self):
+        """Map executable names scripts may use (any port, with or without .exe) to the game client/server."""
+        exes = {}
+        for client, server in list(defs['port.exes'].items())+[(defs['game.exe'], defs['game.server'])]:
+            exes.update({x.casefold(): defs['game.exe'] for x in (client, os.path.splitext(client)[0])})
+            exes.update({x.casefold(): defs['game.server'] for x in (server, os.path.splitext(server)[0])})
+        return exes
+
+    def parseScript(self, fpath):
+        """Encapsulate a launch script's contents (any registered format)."""
+        try: cmds = [x.line() for x in parseScript(fpath, self.gameExes(), defs['script.bytes'], defs['script.lines'])]
+        except scriptSkip as err: reason = str(err)
+        except OSError as err: reason = err.strerror or str(err)
+        except Exception as err: reason = 'unparsable: %s' % err  # A parser bug must not drop the whole mod dir
+        else:
+            cache['scan.skipped'].pop(fpath, None)
+            return cmds
+        cache['scan.skipped'][fpath] = reason
+        return None  # Not cached, retried when it changes
+
+    def iterMods(self, paths=None, cancel=None, budget=None):
+        """Stream (title, commands, mod dir) launcher records: base game and RoE first, then mods as found.
+
+        Only the given mod dirs are rescanned if paths are set.
+        """
+        engine = singletons.scanEngine
+        if paths is None or engine.last is None or any([x in paths for x in engine.last.roots]):
+            stream = engine.iterScan(defs['game.dir'], self.parseScript, (APPDIR,), cancel, budget, defs['mod.roots'])
+        else: stream = engine.iterRefresh(paths, self.parseScript)
+        result = next(stream)
+        if result.index.findFile(defs['game.exe']) is None: return
+        yield from [(x, cmds, defs['game.dir']) for x, cmds in self.baseMods(result).items()]
+        for modPath, launchers in stream:
+            yield from [(x, launchers[x], modPath) for x in launchers]
+
+    def baseMods(self, result):
+        """Return the base game and RoE launchers of a scan (the bare executable is resolved in the game dir)."""
+        gameEXE = subprocess.list2cmdline([defs['game.exe']])
         launchers = {}
-        # Scanning
-        if 'base' in [x.lower() for x in os.listdir(defs['game.dir'])]:  # Base game
+        if result.index.hasDir('base'):  # Base game
             launchers['%sPlay Doom 3' % defs['list.spc']] = [gameEXE]
-        if 'd3xp' in [x.lower() for x in os.listdir(defs['game.dir'])]:  # Expansion RoE
+        if result.index.hasDir('d3xp'):  # Expansion RoE
             launchers['%sPlay Resurrection of evil' % defs['list.spc']] = ['%s +set fs_game_base d3xp' % gameEXE]
-        for x in modDirs:  # Scan mod dirs
-            if '.bat' in [os.path.splitext(y)[1] for y in os.listdir(x)]:
-                rawBatches = {os.path.splitext(y)[0]: self.parseBat(
-                    os.path.join(x, y)) for y in os.listdir(x) if '.bat' in os.path.splitext(y)}
-                [launchers.update({'%s%s' % (defs['list.spc'],
-                    y): rawBatches[y]}) for y in rawBatches.keys() if rawBatches[y] is not None]
-        cache['launchers.full'] = launchers
-        cache['launchers'] = {x: launchers[x] for x in launchers if x not in conf['launch.exclusions']}
-        cache['launchers'].update(conf['custom.launchers'])
-        return sorted([x for x in cache['launchers']])
+        return launchers
+
+    def collectMods(self, result):
+        """Return all launchers of a completed scan and their mod dirs."""
+        if result.index.findFile(defs['game.exe']) is None: return {}, {}
+        launchers = self.baseMods(result)
+        sources = {x: defs['game.dir'] for x in launchers}
+        for modPath, modLaunchers in result.iterMods():  # Mod dirs, first root wins
+            for x in modLaunchers:
+                if x not in launchers: launchers[x], sources[x] = modLaunchers[x], modPath
+        return launchers, sources
+
+    def listMods(self):
+        """Visible launchers (scanned ones not excluded, and custom ones) matching the search box."""
+        return singletons.catalog.find(self.searchBox.GetValue())
 
 
 class MainFrame(wx.Frame):
@@ -457,8 +740,11 @@ class MainFrame(wx.Frame):
         """Init."""
         wx.Frame.__init__(self, parent, id=wx.ID_ANY, title=title, pos=pos, size=size, style=style)
         setIcon(self)
-        self.timer = wx.Timer()
-        self.detectGameDir()
+        self.watchers = []
+        self.scanner = None
+        self.lastSelected = None
+        self.dirty = set()  # Connection fields being edited
+        self.restoreLast()
         # Layout
         self.panel = MainPanel(self)
         self.Center()
@@ -466,8 +752,15 @@ class MainFrame(wx.Frame):
         # Theming
         [x.SetBackgroundColour(wx.BLACK) for x in (self, self.panel)]
         # Events
-        self.timer.Bind(wx.EVT_TIMER, self.onUpdate)
         self.Bind(wx.EVT_CLOSE, self.onClose)
+        self.Bind(wx.EVT_ACTIVATE, self.onActivate)
+        self.panel.listBox.Bind(wx.EVT_LIST_ITEM_SELECTED, self.onSelect)
+        [x.Bind(wx.EVT_TEXT, self.onText) for x in (self.panel.ipTxt, self.panel.portTxt)]
+        [x.Bind(wx.EVT_KILL_FOCUS, self.onFieldDone) for x in (self.panel.ipTxt, self.panel.portTxt)]
+        [x.Bind(wx.EVT_CHECKBOX, self.onCheck) for x in (self.panel.cnctBox, self.panel.clsBox, self.panel.trayBox)]
+        self.panel.searchBox.Bind(wx.EVT_TEXT, self.onSearch)
+        self.panel.searchBox.Bind(wx.EVT_TEXT_ENTER, self.launch)
+        self.panel.searchBox.Bind(wx.EVT_SEARCHCTRL_CANCEL_BTN, self.onSearchCancel)
         self.panel.actBtn.Bind(wx.EVT_BUTTON, self.launch)
         self.panel.scnBtn.Bind(wx.EVT_BUTTON, self.scanAct)
         self.panel.confBtn.Bind(wx.EVT_BUTTON, self.initConfig)
@@ -476,122 +769,336 @@ class MainFrame(wx.Frame):
         self.panel.edtBtn.Bind(wx.EVT_BUTTON, self.onEdit)
         self.panel.abtBtn.Bind(wx.EVT_BUTTON, self.onAbout)
         # Init
-        self.timer.Start(defs['main.timer'])
+        self.chkSelection()
+        singletons.confLib.watch(lambda: wx.CallAfter(self.onConfChange))
+        self.startDetect()
 
-    def onUpdate(self, event):
-        """Main GUI timed events."""
-        if cache['err.exit']: self.onClose()
-        curLauncherSelection = self.panel.listBox.GetSelection()
-        if curLauncherSelection == -1:
+    def chkSelection(self):
+        """Select the last launched (or the base game) launcher if none is selected."""
+        if self.panel.listBox.GetSelection() == -1:
             if conf['last.launched'] != -1: self.panel.listBox.SetSelection(self.panel.listBox.FindString(conf['last.launched']))
             else: self.panel.listBox.SetSelection(self.panel.listBox.FindString('%sPlay Doom 3' % defs['list.spc']))
-        elif conf['last.launched'] != self.panel.listBox.GetString(curLauncherSelection):
-            conf['last.launched'] = self.panel.listBox.GetString(curLauncherSelection)
-        if conf['connect.ip'] != self.panel.ipTxt.GetValue(): conf['connect.ip'] = self.panel.ipTxt.GetValue()
-        if conf['connect.port'] != self.panel.portTxt.GetValue(): conf['connect.port'] = self.panel.portTxt.GetValue()
-        if conf['connect.launch'] != self.panel.cnctBox.GetValue(): conf['connect.launch'] = self.panel.cnctBox.GetValue()
-        if conf['auto.quit'] != self.panel.clsBox.GetValue(): conf['auto.quit'] = self.panel.clsBox.GetValue()
-        if curLauncherSelection != -1:
-            if any([True for x in cache['launchers'][self.panel.listBox.GetString(curLauncherSelection)] if defs['game.server'] in x]):
-                [x.Hide() for x in (self.panel.ipTxt, self.panel.portTxt, self.panel.cnctBox) if x.IsShown()]
-            else: [x.Show() for x in (self.panel.ipTxt, self.panel.portTxt, self.panel.cnctBox) if not x.IsShown()]
-            if self.panel.listBox.GetString(curLauncherSelection) in conf['custom.launchers']:
-                if self.panel.rmBtn.GetLabel() == 'Hide':
-                    self.panel.rmBtn.SetLabel('Delete')
-                    self.panel.rmBtn.SetName('Delete')
-                    self.panel.rmBtn.Refresh()
-            else:
-                if self.panel.rmBtn.GetLabel() == 'Delete':
-                    self.panel.rmBtn.SetLabel('Hide')
-                    self.panel.rmBtn.SetName('Exclude')
-                    self.panel.rmBtn.Refresh()
-
-    def scanAct(self, event=None):
-        """On scan event."""
-        self.panel.listBox.Clear()
-        self.panel.listBox.InsertItems(self.panel.scanMods(), 0)
+        self.onSelect()
+
+    def onSelect(self, event=None):
+        """Adapt the controls to the selected launcher."""
+        curSelectionStr = self.panel.listBox.GetStringSelection()
+        launcher = singletons.catalog.get(curSelectionStr)
+        if launcher is None: return
+        self.lastSelected = curSelectionStr  # Recorded on launch and exit, not per selection (type-ahead selects per key)
+        if launcher.kind == 'server': [x.Hide() for x in (self.panel.ipTxt, self.panel.portTxt, self.panel.cnctBox) if x.IsShown()]
+        else: [x.Show() for x in (self.panel.ipTxt, self.panel.portTxt, self.panel.cnctBox) if not x.IsShown()]
+        label, name = ('Delete', 'Delete') if launcher.custom else ('Hide', 'Exclude')
+        if self.panel.rmBtn.GetLabel() != label:
+            self.panel.rmBtn.SetLabel(label)
+            self.panel.rmBtn.SetName(name)
+            self.panel.rmBtn.Refresh()
+
+    def onSearch(self, event=None):
+        """Filter the list as the search is typed, selecting the best match."""
+        self.refreshAct()
+        if self.panel.searchBox.GetValue().strip() and self.panel.listBox.GetItemCount():
+            if self.panel.listBox.GetSelection() != 0:
+                self.panel.listBox.SetSelection(0)
+                self.onSelect()
+
+    def onSearchCancel(self, event):
+        """Clear the search (the list filter follows via EVT_TEXT)."""
+        self.panel.searchBox.SetValue('')
+
+    def onText(self, event):
+        """Mark an edited connection field, saved once editing ends."""
+        self.dirty.add(event.GetEventObject().GetName())
+        event.Skip()
+
+    def onFieldDone(self, event):
+        """On leaving a connection field."""
+        self.saveFields()
+        event.Skip()
+
+    def saveFields(self):
+        """Save the edited connection fields."""
+        for key in self.dirty:
+            value = self.FindWindowByName(key).GetValue()
+            if conf[key] != value: singletons.confLib.record('set', key, value)
+        self.dirty.clear()
+
+    def saveLast(self):
+        """Save our last selected launcher."""
+        if self.lastSelected is not None and conf['last.launched'] != self.lastSelected:
+            singletons.confLib.record('set', 'last.launched', self.lastSelected)
+
+    def onCheck(self, event):
+        """On toggling a check box."""
+        singletons.confLib.record('set', event.GetEventObject().GetName(), event.IsChecked())
+
+    def scanAct(self, event=None, paths=None):
+        """On scan event (the Scan button stops a running scan)."""
+        if event is not None and self.scanner is not None: self.cancelScan()
+        else: self.startScan(paths)
+
+    def startScan(self, paths=None):
+        """Stream a scan on a worker thread."""
+        if self.scanner is not None:  # Restart interrupted scans in full
+            self.scanner.set()
+            paths = None
+        self.scanner = threading.Event()
+        self.setScanBtn('Stop')
+        threading.Thread(target=self.scanWorker, args=(self.scanner, paths), name='scanMods', daemon=True).start()
+
+    def scanWorker(self, scanner, paths):
+        """Worker thread: post launcher records to the GUI in batches."""
+        start = time.perf_counter()
+        batch, posted, final = {}, 0, None
+        try:
+            for title, cmds, source in self.panel.iterMods(paths, scanner, defs['scan.budget']):
+                batch[title] = (cmds, source)
+                if not posted or time.perf_counter()-posted > 0.05:  # First record right away
+                    wx.CallAfter(self.onScanRecords, scanner, batch, start)
+                    batch, posted = {}, time.perf_counter()
+            if not singletons.scanEngine.cancelled and not scanner.is_set():
+                final = self.panel.collectMods(singletons.scanEngine.last)
+                singletons.scanIndex.remember((defs['game.dir'], defs['game.exe'], defs['game.server']), *final)
+                singletons.scanIndex.store()
+        finally: wx.CallAfter(self.onScanDone, scanner, batch, final)
+
+    def onScanRecords(self, scanner, records, start):
+        """Show streamed launchers (GUI thread)."""
+        if not self or scanner is not self.scanner: return
+        if cache['scan.first'] is None: cache['scan.first'] = time.perf_counter()-start
+        singletons.catalog.addScanned(records)
+        self.refreshAct()
+
+    def onScanDone(self, scanner, records, final):
+        """Apply a finished scan, removals included (GUI thread)."""
+        if not self or scanner is not self.scanner: return
+        self.scanner = None
+        self.setScanBtn('Scan')
+        singletons.catalog.addScanned(records)
+        if final is not None: singletons.catalog.setScanned(*final)
+        self.refreshAct()
+        self.setSkipped()
+
+    def setSkipped(self):
+        """Report skipped launch scripts on the Scan button."""
+        skipped = dict(cache['scan.skipped'])
+        self.panel.scnBtn.SetToolTip('Skipped files and dirs:\n%s' % '\n'.join(['%s: %s' % (x, skipped[x])
+            for x in sorted(skipped)]) if skipped else 'Scan for launchers')
+
+    def cancelScan(self):
+        """Stop a running scan, keeping the launchers found so far."""
+        if self.scanner is None: return
+        self.scanner.set()
+        self.scanner = None
+        self.setScanBtn('Scan')
+
+    def setScanBtn(self, label):
+        """Toggle the Scan/Stop button."""
+        if self.panel.scnBtn.GetLabel() != label:
+            self.panel.scnBtn.SetLabel(label)
+            self.panel.scnBtn.Refresh()
+
+    def refreshAct(self):
+        """Refresh the list after settings changes (no disk access)."""
+        self.setList(self.panel.listMods())
+
+    def setList(self, items):
+        """Apply a new launcher list to the list box."""
+        self.panel.listBox.SetItems(items)
+        self.chkSelection()
+
+    def startWatcher(self):
+        """Watch the game dir and mod library roots for launcher changes."""
+        if not defs['game.dir']: return
+        for root in [defs['game.dir']]+defs['mod.roots']:
+            watcher = dirWatcher(root, lambda paths: wx.CallAfter(self.onWatch, paths), singletons.scanEngine, exclude=(APPDIR,))
+            watcher.start()
+            self.watchers.append(watcher)
+
+    def onWatch(self, paths):
+        """On filesystem changes (GUI thread)."""
+        if not self: return  # Frame already destroyed
+        roots = [os.path.normpath(x) for x in [defs['game.dir']]+defs['mod.roots']]
+        if any([x in paths for x in roots]): self.dropVanished(roots)
+        self.startScan(paths)
+
+    def dropVanished(self, roots):
+        """Drop the launchers of removed mod dirs at once, the rescan may take a while (unreachable roots keep theirs)."""
+        gone = [x for x in singletons.catalog.sources() if x is not None and os.path.normpath(x) not in roots
+            and not os.path.isdir(x) and os.path.isdir(os.path.dirname(x))]
+        if not gone: return
+        singletons.catalog.dropSources(gone)
+        self.refreshAct()
+
+    def onActivate(self, event):
+        """Catch up with other instances and the game dir on activation (both are only polled slowly without inotify)."""
+        if event.GetActive() and singletons.confLib.watcher is not None: self.onConfChange()
+        if event.GetActive(): [x.wake() for x in self.watchers]
+        event.Skip()
+
+    def onConfChange(self):
+        """Apply settings changed by other instances (GUI thread)."""
+        if not self: return
+        keys = singletons.confLib.sync()
+        if 'custom.launchers' in keys: singletons.catalog.setCustoms(conf['custom.launchers'])
+        if 'launch.exclusions' in keys: singletons.catalog.setExcluded(conf['launch.exclusions'])
+        if keys & {'custom.launchers', 'launch.exclusions'}: self.refreshAct()
+        for key, ctrl in (('connect.ip', self.panel.ipTxt), ('connect.port', self.panel.portTxt)):
+            if key in keys and key not in self.dirty: ctrl.ChangeValue(conf[key])
+        for key, ctrl in (('connect.launch', self.panel.cnctBox), ('auto.quit', self.panel.clsBox), ('tray.resident', self.panel.trayBox)):
+            if key in keys: ctrl.SetValue(conf[key])
+
+    def restoreLast(self):
+        """Show the outcome of the last complete scan until detection and scanning finish."""
+        index = singletons.scanIndex
+        if index.game is None: return
+        defs['game.dir'], defs['game.exe'], defs['game.server'] = index.game
+        singletons.catalog.rebuild()  # Custom launchers were compiled before the game dir was known
+        singletons.catalog.setScanned(index.launchers, index.sources)
+
+    def startDetect(self):
+        """Detect the game dir on a worker thread, then scan."""
+        threading.Thread(target=self.detectWorker, name='detectGameDir', daemon=True).start()
+
+    def detectWorker(self):
+        """Worker thread: post the detection outcome to the GUI."""
+        found = None
+        try: found = self.cachedGameDir() or self.detectGameDir()
+        finally: wx.CallAfter(self.onDetected, found)
+
+    def gameSigs(self, probe, found):
+        """Return the stat signatures of the game executables and of the client executables a probe may find.
+
+        Only executables are signed: the probed dir usually is the app dir, which changes with every settings write.
+        """
+        return tuple([signature(os.path.join(found[0], x)) for x in found[1:]]+[signature(os.path.join(x, exe))
+            for x in (probe, os.path.dirname(probe)) for exe in defs['port.exes']])
+
+    def cachedGameDir(self):
+        """Return the last detected game dir if its executables are unchanged, else None (any thread)."""
+        install = singletons.scanIndex.install
+        if install is None: return None
+        probe, found, sigs = install
+        if probe != (APPDIR if not defs['dev.path'] else defs['dev.path']): return None
+        if sigs[0] is None or sigs != self.gameSigs(probe, found): return None
+        return found
 
     def detectGameDir(self):
-        """Detect game directory."""
+        """Detect game directory, return (dir, exe, server) or None (any thread)."""
         appTmpDir = APPDIR if not defs['dev.path'] else defs['dev.path']
+        # Own dir first, then game root
+        candidates = [singletons.scanEngine.dirIndex(x) for x in (appTmpDir, os.path.dirname(appTmpDir))]
+        found = None
         for exe in defs['port.exes'].keys():
-            # Detect if installed in own dir
-            if exe in [x.lower() for x in os.listdir(appTmpDir)]:
-                defs['game.exe'] = [x for x in os.listdir(appTmpDir) if x.lower() == exe.lower()][0]
-                defs['game.server'] = [x for x in os.listdir(appTmpDir) if x.lower() == defs['port.exes'][exe].lower()][0]
-                defs['game.dir'] = appTmpDir
-            # Detect if installed in game root
-            elif exe in [x.lower() for x in os.listdir(os.path.dirname(appTmpDir))]:
-                defs['game.exe'] = [x for x in os.listdir(os.path.dirname(appTmpDir)) if x.lower() == exe.lower()][0]
-                defs['game.server'] = [x for x in os.listdir(os.path.dirname(appTmpDir)) if x.lower() == defs['port.exes'][exe].lower()][0]
-                defs['game.dir'] = os.path.dirname(appTmpDir)
-        if not defs['game.dir']:
-            ErrDialog(None, 'Unable to detect Doom3/dhewm3 directory', 'Unable to auto-detect Doom3/dhewm3 directory!',
+            for index in candidates:
+                if index.findFile(exe) is not None:
+                    found = (index.path, index.findFile(exe), index.findFile(defs['port.exes'][exe]) or defs['port.exes'][exe])
+                    break
+        if found is not None:
+            singletons.scanIndex.rememberInstall((appTmpDir, found, self.gameSigs(appTmpDir, found)))
+            singletons.scanIndex.store()
+        return found
+
+    def onDetected(self, found):
+        """Apply the detected game directory or report failure (GUI thread)."""
+        if not self: return
+        if found is None:
+            defs['game.dir'] = ''
+            ErrDialog(self, 'Unable to detect Doom3/dhewm3 directory', 'Unable to auto-detect Doom3/dhewm3 directory!',
                 'Autodetection will work if d3launcher is installed within Doom3/dhewm3 directory or in it\'s own directory '
                 'nested within Doom3/dhewm3 directory.\n\nYou may override the Doom3/dhewm3 path by saving a file named \'override.'
                 'ini\' in the d3launcher directory. It has to contain only something like this:\n      D:/Games/dhewm3/\n\n').ShowModal()
-            cache['err.exit'] = True
+            wx.CallAfter(self.onClose)
+            return
+        if (defs['game.dir'], defs['game.exe'], defs['game.server']) != found:
+            defs['game.dir'], defs['game.exe'], defs['game.server'] = found
+            singletons.catalog.rebuild()
+        self.startScan()
+        self.startWatcher()
 
     def initConfig(self, event):
         """Open configuration dialog."""
-        self.timer.Stop()
         confDialog(self).ShowModal()
-        self.scanAct()
-        self.timer.Start(defs['main.timer'])
+        self.refreshAct()
 
     def onAddCustom(self, event):
         """Open add custom launcher dialog."""
-        self.timer.Stop()
         addDialog(self).ShowModal()
-        self.scanAct()
-        self.timer.Start(defs['main.timer'])
+        self.refreshAct()
 
     def onAbout(self, event):
         """About dialog."""
-        self.timer.Stop()
         aboutDialog(self).ShowModal()
-        self.scanAct()
-        self.timer.Start(defs['main.timer'])
+        self.refreshAct()
 
     def onExclude(self, event):
         """Add items to exclusion list."""
-        self.timer.Stop()
         curSelection = self.panel.listBox.GetSelection()
+        if curSelection == -1: return
         action = event.GetEventObject().GetName()
         if action == 'Exclude':
-            conf['launch.exclusions'].append(self.panel.listBox.GetString(curSelection))
+            singletons.confLib.record('add', 'launch.exclusions', self.panel.listBox.GetString(curSelection))
         elif action == 'Delete':
-            conf['custom.launchers'].pop(self.panel.listBox.GetString(curSelection), None)
-        self.scanAct()
-        self.timer.Start(defs['main.timer'])
+            singletons.confLib.record('del', 'custom.launchers', self.panel.listBox.GetString(curSelection))
+        self.refreshAct()
 
     def onEdit(self, event):
         """Edit a launcher."""
-        self.timer.Stop()
-        curSelectionStr = self.panel.listBox.GetString(self.panel.listBox.GetSelection())
-        addDialog(self, edit=(curSelectionStr, cache['launchers'][curSelectionStr])).ShowModal()
-        self.scanAct()
-        self.timer.Start(defs['main.timer'])
+        curSelectionStr = self.panel.listBox.GetStringSelection()
+        if curSelectionStr is None: return
+        addDialog(self, edit=(curSelectionStr, singletons.catalog[curSelectionStr].cmds)).ShowModal()
+        self.refreshAct()
 
     def launch(self, event):
         """Launch selected."""
         curSelection = self.panel.listBox.GetSelection()
         if any([defs['game.dir'] is None, curSelection == -1]): return
-        curSelectionStr = self.panel.listBox.GetString(curSelection)
-        os.chdir(defs['game.dir'])
-        if len(cache['launchers'][curSelectionStr]) == 1:
-            if not defs['game.server'] in cache['launchers'][curSelectionStr][0]:
-                if not conf['connect.launch']: subprocess.Popen(cache['launchers'][curSelectionStr][0])
-                else: subprocess.Popen('%s %s' % (cache['launchers'][curSelectionStr][0],
-                    '+connect %s%s' % (conf['connect.ip'], ':%s' % conf['connect.port'] if conf['connect.port'] else '')))
-            else: subprocess.Popen(cache['launchers'][curSelectionStr][0])
-        else: [subprocess.Popen(execCMD) for execCMD in cache['launchers'][curSelectionStr]]
-        if self.panel.clsBox.GetValue(): self.onClose()
+        self.saveFields()
+        self.saveLast()
+        launcher = singletons.catalog[self.panel.listBox.GetString(curSelection)]
+        cmds = launcher.argv
+        if len(cmds) == 1 and launcher.kind != 'server' and conf['connect.launch']:
+            cmds = [cmds[0]+['+connect', '%s%s' % (conf['connect.ip'], ':%s' % conf['connect.port'] if conf['connect.port'] else '')]]
+        try: [subprocess.Popen(argv, cwd=defs['game.dir']) for argv in cmds if argv]
+        except OSError as err:
+            ErrDialog(self, 'Unable to launch', 'Unable to launch%s!' % launcher.title, '%s\n\n' % err).ShowModal()
+            return
+        if self.panel.trayBox.GetValue() and adv.TaskBarIcon.IsAvailable(): self.toTray()
+        elif self.panel.clsBox.GetValue(): self.onClose()
+
+    def toTray(self):
+        """Hide to the tray: the catalog, images and watchers stay warm, what is rebuilt on demand is dropped."""
+        if not self.IsShown(): return
+        if singletons.systray is None: singletons.systray = trayIcon(self)
+        self.Hide()
+        singletons.confLib.flush()
+        singletons.catalog.trim()
+        trim()
+        cache['tray.rss']['hidden'] = rss()
+
+    def fromTray(self):
+        """Re-show the window as it was left."""
+        if self.IsIconized(): self.Iconize(False)
+        self.Show()
+        self.Raise()
+        wx.CallAfter(self.noteRss)
+
+    def noteRss(self):
+        """Memory in use with the window shown (once drawn)."""
+        cache['tray.rss']['shown'] = rss()
 
     def onClose(self, event=None):
         """Exit actions."""
-        self.timer.Stop()
-        singletons.confLib.store()
+        self.saveFields()
+        self.saveLast()
+        self.cancelScan()
+        [x.stop() for x in self.watchers]
+        if singletons.confLib.watcher is not None: singletons.confLib.watcher.stop()
+        singletons.confLib.flush()
+        if singletons.systray is not None:
+            singletons.systray.RemoveIcon()
+            singletons.systray.Destroy()
+            singletons.systray = None
         singletons.MainFrame.Hide()
         singletons.MainFrame.Destroy()
         singletons.app.ExitMainLoop()
@@ -616,9 +1123,16 @@ class main:
 
     def __init__(self):
         """Init."""
+        cache['startup.start'] = time.perf_counter()
         self.detectDev()
         singletons.confLib = confLib()
         singletons.confLib.restore()
+        singletons.scanIndex = scanIndex()
+        singletons.scanIndex.restore()
+        singletons.scanEngine = scanEngine(singletons.scanIndex)
+        singletons.catalog = launcherCatalog()
+        singletons.catalog.setCustoms(conf['custom.launchers'])
+        singletons.catalog.setExcluded(conf['launch.exclusions'])
         self.storeLicense()
         self.initGUI()
 
@@ -628,16 +1142,21 @@ class main:
             devFile = os.path.join(APPDIR, 'override.ini')
             if os.path.isfile(devFile):
                 with open(devFile) as inp:
-                    devGamePath = inp.read()
-                    if devGamePath.strip():
-                        defs['dev.path']=devGamePath.strip()
+                    devPaths = [x.strip() for x in inp.read().splitlines() if x.strip()]
+                    if devPaths:
+                        defs['dev.path']=devPaths[0]
+                        defs['mod.roots']=devPaths[1:]  # Extra mod library roots
         except: pass
 
     def storeLicense(data):
-        """Store license in app dir."""
+        """Store license in app dir (if missing or altered)."""
         try:
-            with open(os.path.join(APPDIR, 'LICENSE'), 'w') as lf:
-                lf.write(creds['License'])
+            licFile, license = os.path.join(APPDIR, 'LICENSE'), creds['License'].encode('utf-8')
+            if os.path.isfile(licFile) and os.path.getsize(licFile) == len(license):
+                with open(licFile, 'rb') as lf:
+                    if lf.read() == license: return
+            with open(licFile, 'wb') as lf:
+                lf.write(license)
         except: pass
 
     def initGUI(self):
@@ -648,8 +1167,14 @@ class main:
         singletons.MainFrame = MainFrame(None, '%s %s' % (APPNAME, APPVER[0]), pos, size)
         singletons.app.SetTopWindow(singletons.MainFrame)
         singletons.MainFrame.Show()
+        wx.CallAfter(self.onShown)
         singletons.app.MainLoop()
 
+    def onShown(self):
+        """Time from startup to an interactive window."""
+        cache['startup.time'] = time.perf_counter()-cache['startup.start']
+        singletons.MainFrame.noteRss()
+
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,248 @@
+# -*- coding: utf-8 -*-
+
+# d3Launcher, a Doom3/dhewm3 Launcher
+# Copyright (C) <2021~>  <Dimitrios Koukas>
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Catalog Module.
+
+import os
+from lib.conf import defs
+from lib.scripts import compileCmd, splitCmd
+from lib.search import textIndex
+
+BULK = 256  # Changes above this rebuild the search index instead of updating it
+
+
+class launcherRec:
+    """A launcher: title, commands, compiled argv lists, source mod dir and executable kind."""
+
+    __slots__ = ('title', 'cmds', 'argv', 'source', 'kind', 'custom')
+
+    def __init__(self, title, cmds, source=None, custom=False):
+        """Init."""
+        self.title = title
+        self.cmds = list(cmds)
+        self.argv = [compileCmd(x, defs['game.dir']) for x in self.cmds]
+        self.source = source
+        self.custom = custom
+        exes = {os.path.basename(x[0]).casefold() for x in self.argv if x}
+        if defs['game.server'].casefold() in exes: self.kind = 'server'
+        elif defs['game.exe'].casefold() in exes: self.kind = 'client'
+        else: self.kind = 'other'
+
+    def __repr__(self):
+        """Debug."""
+        return 'launcherRec(%r, %s, %r)' % (self.title, self.kind, self.source)
+
+
+class launcherCatalog:
+    """All launchers: scanned and custom ones, exclusions, and lookup indexes of the visible ones.
+
+    A custom launcher replaces a scanned one of the same title and is shown even if that title is excluded.
+    """
+
+    def __init__(self):
+        """Init."""
+        self.scanned = {}  # Title: launcherRec, from scans
+        self.customs = {}  # Title: launcherRec, user made
+        self.pendingCustoms = None  # Custom launchers set but not built yet ({title: commands})
+        self.excluded = set()
+        self.byName = {}  # Visible title: launcherRec
+        self.bySource = {}  # Mod dir: visible titles
+        self.byKind = {}  # Executable kind: visible titles
+        self.order = None  # Sorted visible titles
+        self.scannedIndex = None  # Scanned titles and commands, built on first search
+        self.visibleIndex = textIndex()  # Visible titles and mod dir names
+
+    def __contains__(self, title):
+        """Visible?"""
+        self.loadCustoms()
+        return title in self.byName
+
+    def __getitem__(self, title):
+        """Visible launcher record."""
+        self.loadCustoms()
+        return self.byName[title]
+
+    def __len__(self):
+        """Visible launchers."""
+        self.loadCustoms()
+        return len(self.byName)
+
+    def get(self, title):
+        """Visible launcher record or None."""
+        self.loadCustoms()
+        return self.byName.get(title)
+
+    def refresh(self, title, reindex=True):
+        """Re-resolve the visible record of a title, keeping the indexes current."""
+        rec = self.customs.get(title)
+        if rec is None and title not in self.excluded: rec = self.scanned.get(title)
+        old = self.byName.get(title)
+        if rec is old: return
+        if old is not None:
+            for index, key in ((self.bySource, old.source), (self.byKind, old.kind)):
+                index[key].discard(title)
+                if not index[key]: del index[key]
+            del self.byName[title]
+        if rec is not None:
+            self.byName[title] = rec
+            self.bySource.setdefault(rec.source, set()).add(title)
+            self.byKind.setdefault(rec.kind, set()).add(title)
+            if reindex: self.visibleIndex.add(title, self.visibleTexts(rec))
+        elif reindex: self.visibleIndex.remove(title)
+        if (old is None) != (rec is None): self.order = None
+
+    def refreshAll(self, titles):
+        """Refresh many titles, rebuilding the search index in one go for large changes."""
+        titles = list(titles)
+        if len(titles) < BULK: return [self.refresh(x) for x in titles]
+        [self.refresh(x, False) for x in titles]
+        self.order = None
+        self.visibleIndex.build({x: self.visibleTexts(self.byName[x]) for x in self.byName})
+
+    def visibleTexts(self, rec):
+        """Searchable texts of a visible record: its title and mod dir name."""
+        return rec.title.strip(), os.path.basename(rec.source or '')
+
+    def setScanned(self, launchers, sources=None):
+        """Replace the scanned launchers ({title: commands}, sources {title: mod dir})."""
+        old, sources = self.scanned, sources or {}
+        self.scanned = {}
+        for title in launchers:
+            rec = old.get(title)
+            if rec is None or rec.cmds != launchers[title] or rec.source != sources.get(title):
+                rec = launcherRec(title, launchers[title], sources.get(title))
+            self.scanned[title] = rec
+        self.scannedIndex = None
+        self.refreshAll(set(old)|set(self.scanned))
+
+    def addScanned(self, records):
+        """Add or update scanned launchers ({title: (commands, source)})."""
+        for title in records:
+            cmds, source = records[title]
+            rec = self.scanned.get(title)
+            if rec is None or rec.cmds != cmds or rec.source != source:
+                self.scanned[title] = launcherRec(title, cmds, source)
+                if self.scannedIndex is not None: self.scannedIndex.add(title, [title]+cmds)
+            self.refresh(title)
+
+    def dropSources(self, sources):
+        """Drop the scanned launchers of mod dirs known to be gone (until the next scan says otherwise)."""
+        sources = set(sources)
+        titles = [x for source in sources for x in self.bySource.get(source, ())]
+        for title in [x for x in titles if x in self.scanned and self.scanned[x].source in sources]:
+            del self.scanned[title]
+            if self.scannedIndex is not None: self.scannedIndex.remove(title)
+        self.refreshAll(titles)
+
+    def setCustoms(self, customs):
+        """Replace the custom launchers ({title: commands}), built on first use (leaving a lazy settings section undecoded)."""
+        self.pendingCustoms = customs
+
+    def loadCustoms(self):
+        """Build the pending custom launchers."""
+        if self.pendingCustoms is None: return
+        customs, self.pendingCustoms = self.pendingCustoms, None
+        stale = [x for x in self.customs if x not in customs]
+        self.customs = {x: launcherRec(x, customs[x], custom=True) for x in customs}
+        self.refreshAll(stale+list(self.customs))
+
+    def setExcluded(self, titles):
+        """Replace the excluded titles."""
+        changed = self.excluded.symmetric_difference(titles)
+        self.excluded = set(titles)
+        self.refreshAll(changed)
+
+    def apply(self, op):
+        """Follow a settings journal record (see lib.store.applyOp)."""
+        self.loadCustoms()
+        kind, key = op[0], op[1]
+        if key == 'custom.launchers':
+            if kind == 'put': self.customs[op[2]] = launcherRec(op[2], op[3], custom=True)
+            elif kind == 'del': self.customs.pop(op[2], None)
+            else: return self.setCustoms(op[2])
+        elif key == 'launch.exclusions':
+            if kind == 'add': self.excluded.add(op[2])
+            elif kind == 'rm': self.excluded.discard(op[2])
+            else: return self.setExcluded(op[2])
+        else: return
+        self.refresh(op[2])
+
+    def rebuild(self):
+        """Recompile every record (after the game dir or executables changed)."""
+        self.scanned = {x: launcherRec(x, self.scanned[x].cmds, self.scanned[x].source) for x in self.scanned}
+        self.scannedIndex = None
+        if self.pendingCustoms is None: self.customs = {x: launcherRec(x, self.customs[x].cmds, custom=True) for x in self.customs}
+        else: self.customs = {}  # Built from the pending ones when first used
+        self.byName, self.bySource, self.byKind, self.order = {}, {}, {}, None
+        self.refreshAll(set(self.scanned)|set(self.customs))
+
+    def titles(self):
+        """Sorted visible titles."""
+        self.loadCustoms()
+        if self.order is None: self.order = sorted(self.byName)
+        return self.order
+
+    def find(self, query=''):
+        """Visible titles matching a search: prefix matches first, then (3+ letters) substring matches."""
+        query = query.strip()
+        if not query: return self.titles()
+        self.loadCustoms()
+        prefix = self.visibleIndex.prefix(query)
+        if len(prefix) == len(self.byName): return self.titles()
+        found = self.visibleIndex.search(query, prefix) if len(query) > 2 else ()
+        if len(prefix)+len(found) > 64:  # Walking the sorted titles beats sorting big results
+            return [x for x in self.titles() if x in prefix]+[x for x in self.titles() if x in found]
+        return sorted(prefix)+sorted(found)
+
+    def sources(self):
+        """Mod dirs of the visible launchers (None for custom ones)."""
+        self.loadCustoms()
+        return list(self.bySource)
+
+    def fromSource(self, source):
+        """Visible titles of a mod dir."""
+        return sorted(self.bySource.get(source, ()))
+
+    def ofKind(self, kind):
+        """Visible titles by executable kind ('client', 'server' or 'other')."""
+        self.loadCustoms()
+        return sorted(self.byKind.get(kind, ()))
+
+    def excludedTitles(self):
+        """Sorted excluded titles."""
+        return sorted(self.excluded)
+
+    def hasTitle(self, title):
+        """Title taken by a scanned or custom launcher (visible or not)?"""
+        self.loadCustoms()
+        return title in self.scanned or title in self.customs
+
+    def iterScanned(self, query=''):
+        """Scanned launcher records by title, those with query in their title or commands if set."""
+        if not query: titles = self.scanned
+        else:
+            if self.scannedIndex is None:
+                self.scannedIndex = textIndex()
+                self.scannedIndex.build({x: [x]+self.scanned[x].cmds for x in self.scanned})
+            titles = self.scannedIndex.search(query)
+        return [self.scanned[x] for x in sorted(titles)]
+
+    def trim(self):
+        """Drop what is rebuilt on demand (the Add/Edit dialog index, the command split memo), keeping the visible records warm."""
+        self.scannedIndex = None
+        splitCmd.cache_clear()
@@ -36,9 +36,11 @@ SPC = ((0, 0), 1, wx.EXPAND, 5)
 # Settings
 cache = {
 
-    'launchers': {},
-    'launchers.full': {},
-    'err.exit': False
+    'scan.first': None,
+    'scan.skipped': {},
+    'startup.start': 0,
+    'startup.time': None,
+    'tray.rss': {'shown': None, 'hidden': None}
 
 }
 
@@ -48,9 +50,21 @@ defs = {
     'game.exe': '',
     'game.server': '',
     'game.dir': '',
-    'main.timer': 100,
     'list.spc': ' ',
-    'dev.path': ''
+    'dev.path': '',
+    'mod.roots': [],
+    'scan.workers': 8,
+    'scan.timeout': 10.0,
+    'scan.budget': 60.0,
+    'script.bytes': 65536,
+    'script.lines': 2000,
+    'conf.delay': 0.5,
+    'conf.durability': 'flush',
+    'conf.backups': 3,
+    'conf.journal': 65536,
+    'conf.poll': 10.0,
+    'watch.poll': 5.0,
+    'watch.idle': 60.0
 
 }
 
@@ -62,7 +76,8 @@ conf = {
     'launch.exclusions': [],
     'last.launched': -1,
     'custom.launchers': {},
-    'auto.quit': True
+    'auto.quit': True,
+    'tray.resident': False
 
 }
 
@@ -101,17 +116,23 @@ creds = {
     
     * For the d3Launcher to auto-detect any mod launcher's a .bat file is needed on the mod's directory containing the arguments to launch the mod. Usually mod authors add them, otherwise the equivalent launcher will need to be created manually.
     
+    * Besides .bat files, .cmd, .sh and .desktop launch scripts are recognized too, as well as d3Launcher manifests: a .d3l file holding something like {"commands": ["dhewm3.exe +set fs_game mymod"]}. The launcher's title is the file's name.
+    
     * To unhide a hidden launcher, you will need to click the "Excluded" button on the top left corner of the app, select it and then click "Restore Selected Items".
     
     * If you have renamed the Doom3/dhewm3 client or server executables then d3Launcher will not be able to function correctly. If there are issues with this I will add an option to set them manually, just let me know.
     
     * The IP/Port connect fields appear only when d3Launcher detects the client executable of Doom3/dhewm3 on the launcher's arguments. If they are missing you most propably have selected a launcher which uses the dedicated executable of Doom3/dhewm3.
     
+    * With "Tray" checked, launching hides d3Launcher to a tray icon instead of closing it, so it comes back instantly: click the icon to show it again, or right click it to re-launch the last launcher or quit.
+    
     * Do no use any ports when connecting to a LAN, input only the IP of the server (works for Hamachi).
     
     * You may override the Doom3/dhewm3 path by saving a file named 'override.ini' in the d3launcher directory. It has to contain only something like this: 
     D:/Games/dhewm3/
     
+    * Mods kept outside the Doom3/dhewm3 directory can be scanned too, by adding their library directories to 'override.ini', one per line after the Doom3/dhewm3 path. If the same mod is found in more than one place, the first one (in the order of the lines) is used.
+    
     ''',
 
     # License
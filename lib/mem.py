@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+# d3Launcher, a Doom3/dhewm3 Launcher
+# Copyright (C) <2021~>  <Dimitrios Koukas>
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Memory Module.
+
+import os, gc, ctypes, ctypes.util
+
+
+class processCounters(ctypes.Structure):
+    """PROCESS_MEMORY_COUNTERS (Windows)."""
+
+    _fields_ = [('cb', ctypes.c_ulong), ('PageFaultCount', ctypes.c_ulong), ('PeakWorkingSetSize', ctypes.c_size_t),
+        ('WorkingSetSize', ctypes.c_size_t), ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+        ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+        ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+
+def rss():
+    """Resident set (working set) size of this process in bytes, None if unknown."""
+    try:
+        if os.name == 'nt':
+            counters = processCounters()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb): return None
+            return counters.WorkingSetSize
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1])*os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError): return None
+
+
+def trim():
+    """Collect garbage and hand free memory back to the OS (pages stay cached, so touching them again is cheap)."""
+    gc.collect()
+    try:
+        if os.name == 'nt':
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetProcessWorkingSetSize(kernel32.GetCurrentProcess(), ctypes.c_size_t(-1), ctypes.c_size_t(-1))
+        else:
+            libc = ctypes.CDLL(ctypes.util.find_library('c'))
+            if hasattr(libc, 'malloc_trim'): libc.malloc_trim(0)
+    except (OSError, AttributeError): pass
@@ -0,0 +1,473 @@
+# -*- coding: utf-8 -*-
+
+# d3Launcher, a Doom3/dhewm3 Launcher
+# Copyright (C) <2021~>  <Dimitrios Koukas>
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Scan Module.
+
+import os, json, time, queue, hashlib, threading
+from concurrent.futures import Future, wait, FIRST_COMPLETED
+from lib.conf import APPNAME, APPDIR, cache, defs
+from lib.scripts import formats
+from lib.store import atomicWrite
+
+INDEX_VERSION = 3  # Bump when the stored launchers change shape
+
+
+class scanStats:
+    """Filesystem call counters of a scan."""
+
+    def __init__(self):
+        """Init."""
+        self.lock = threading.Lock()
+        self.reset()
+
+    def add(self, listings=0, stats=0):
+        """Count filesystem calls (thread safe)."""
+        with self.lock:
+            self.listings += listings
+            self.stats += stats
+
+    def reset(self):
+        """Zero the counters."""
+        self.listings = 0
+        self.stats = 0
+
+    def __str__(self):
+        """Counters summary."""
+        return 'listings: %s, stats: %s' % (self.listings, self.stats)
+
+
+stats = scanStats()
+
+
+class daemonPool:
+    """Bounded pool of daemon worker threads.
+
+    Unlike ThreadPoolExecutor its workers are not joined at exit, so a listing hung on an unavailable network
+    root cannot keep the process from quitting.
+    """
+
+    def __init__(self, workers, name):
+        """Init."""
+        self.workers = workers
+        self.name = name
+        self.tasks = queue.SimpleQueue()
+        self.threads = []
+        self.closed = False
+
+    def submit(self, func, *args):
+        """Queue a call, return its Future."""
+        future = Future()
+        self.tasks.put((future, func, args))
+        if len(self.threads) < self.workers:
+            thread = threading.Thread(target=self.work, name='%s_%s' % (self.name, len(self.threads)), daemon=True)
+            self.threads.append(thread)
+            thread.start()
+        return future
+
+    def work(self):
+        """Worker: run queued calls until shut down."""
+        while True:
+            task = self.tasks.get()
+            if task is None: return
+            future, func, args = task
+            if self.closed: future.cancel()
+            if not future.set_running_or_notify_cancel(): continue
+            try: future.set_result(func(*args))
+            except BaseException as err: future.set_exception(err)
+
+    def shutdown(self):
+        """Cancel the queued calls and let idle workers exit (busy ones are abandoned)."""
+        self.closed = True
+        [self.tasks.put(None) for x in self.threads]
+
+
+def signature(path):
+    """Return the (mtime, size) signature of a path."""
+    stats.add(stats=1)
+    try:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+    except OSError: return None
+
+
+def isGameExe(name):
+    """Check if a file name is a known game executable (case-insensitively)."""
+    return name.casefold() in {x.casefold() for x in list(defs['port.exes'].keys())+list(defs['port.exes'].values())}
+
+
+def tupled(value):
+    """Return a JSON array (signature, key) as a tuple, None as is."""
+    return tuple(value) if value is not None else None
+
+
+class dirIndex:
+    """Case-folded names of a directory mapped to the real names."""
+
+    def __init__(self, path, sig):
+        """Init."""
+        self.path = path
+        self.sig = sig
+        self.files = {}  # Case-folded name: real name
+        self.dirs = {}  # Case-folded name: real name
+
+    def find(self, name):
+        """Return the real name of a file or dir matched case-insensitively, or None."""
+        key = name.casefold()
+        return self.files.get(key, self.dirs.get(key))
+
+    def findFile(self, name):
+        """Return the real name of a file matched case-insensitively, or None."""
+        return self.files.get(name.casefold())
+
+    def hasDir(self, name):
+        """Check for a dir case-insensitively."""
+        return name.casefold() in self.dirs
+
+    def iterDirs(self):
+        """Yield (case-folded name, path) of the subdirs, sorted."""
+        for x in sorted(self.dirs):
+            yield x, os.path.join(self.path, self.dirs[x])
+
+
+def fingerprint(launchers):
+    """Return a content fingerprint of a mod dir's launchers (None if empty)."""
+    if not launchers: return None
+    return hashlib.sha1(repr(sorted(launchers.items())).encode()).hexdigest()
+
+
+class scanResult:
+    """Structured result of a directory scan."""
+
+    def __init__(self, path, index):
+        """Init."""
+        self.path = path
+        self.index = index  # dirIndex of path
+        self.roots = [os.path.normpath(path)]  # Mod library roots by precedence
+        self.launchers = {}  # Mod dir path: {title: commands}
+        self.duplicates = []  # Mod dirs collapsed into higher precedence ones
+
+    def iterMods(self):
+        """Yield (mod dir, launchers) by root precedence, collapsing duplicate mods (same name or content)."""
+        rank = {os.path.normcase(os.path.abspath(x)): n for n, x in enumerate(self.roots)}
+        order = lambda x: (rank.get(os.path.normcase(os.path.abspath(os.path.dirname(x))), len(rank)), x.casefold())
+        names, prints, self.duplicates = set(), set(), []
+        for modPath in sorted(self.launchers, key=order):
+            name, fp = os.path.basename(modPath).casefold(), fingerprint(self.launchers[modPath])
+            if name in names or (fp is not None and fp in prints):
+                self.duplicates.append(modPath)
+                continue
+            names.add(name)
+            prints.add(fp)
+            yield modPath, self.launchers[modPath]
+
+
+class scanIndex:
+    """Persistent mod directory scan index (JSON, so loading it cannot run code)."""
+
+    def __init__(self):
+        """Init."""
+        idxFile = '%s.idx' % APPNAME
+        self.idxFile = os.path.join(APPDIR, idxFile)
+        self.key = None
+        self.entries = {}
+        self.game = None  # Last (game.dir, game.exe, game.server)
+        self.install = None  # Last detection: (probed dir, (game.dir, game.exe, game.server), executable signatures)
+        self.scripts = {}  # Script path: (signature, parsed commands)
+        self.launchers = {}  # Last complete scan, shown on startup
+        self.sources = {}  # Their mod dirs
+        self.changed = False
+        self.lock = threading.RLock()
+
+    def signature(self, path):
+        """Return the (mtime, size) signature of a path."""
+        return signature(path)
+
+    def validate(self, key):
+        """Drop all entries if they were produced for another game setup."""
+        with self.lock:
+            if self.key != key:
+                self.key = key
+                self.entries, self.scripts = {}, {}
+                self.changed = True
+
+    def lookup(self, path, dirSig):
+        """Return cached launchers of a mod dir if it is unchanged, else None."""
+        entry = self.entries.get(path)
+        if entry is None or dirSig is None: return None
+        if entry[0] != dirSig: return None
+        scripts, launchers = entry[1:]
+        # Script edits do not touch the dir mtime, verify each one
+        if any([self.signature(x) != scripts[x] for x in scripts]): return None
+        return launchers
+
+    def update(self, path, dirSig, scripts, launchers):
+        """Record the scan result of a mod dir, scripts being {path: signature}."""
+        with self.lock:
+            self.entries[path] = (dirSig, scripts, launchers)
+            self.changed = True
+
+    def script(self, path, sig):
+        """Return the cached commands of an unchanged script, else None."""
+        entry = self.scripts.get(path)
+        if entry is None or sig is None or entry[0] != sig: return None
+        return entry[1]
+
+    def rememberScript(self, path, sig, cmds):
+        """Cache the parsed commands of a script."""
+        if sig is None: return
+        with self.lock:
+            self.scripts[path] = (sig, cmds)
+            self.changed = True
+
+    def prune(self, paths):
+        """Forget mod dirs (and their scripts) that no longer exist."""
+        with self.lock:
+            for x in [y for y in self.entries if y not in paths]:
+                del self.entries[x]
+                self.changed = True
+            for x in [y for y in self.scripts if os.path.dirname(y) not in paths]:
+                del self.scripts[x]
+                self.changed = True
+
+    def remember(self, game, launchers, sources):
+        """Keep the outcome of a complete scan for the next startup."""
+        with self.lock:
+            if (game, launchers, sources) != (self.game, self.launchers, self.sources):
+                self.game, self.launchers, self.sources = game, launchers, sources
+                self.changed = True
+
+    def rememberInstall(self, install):
+        """Keep a detected game install and its executable signatures."""
+        with self.lock:
+            if install != self.install:
+                self.install = install
+                self.changed = True
+
+    def store(self):
+        """Save the index if altered."""
+        with self.lock:
+            if not self.changed: return
+            try:
+                atomicWrite(self.idxFile, json.dumps({'key': self.key, 'entries': self.entries, 'game': self.game,
+                    'launchers': self.launchers, 'sources': self.sources, 'install': self.install, 'scripts': self.scripts},
+                    ensure_ascii=False).encode('utf-8'), False)
+                self.changed = False
+            except: pass
+
+    def restore(self):
+        """Restore the saved index."""
+        try:
+            with open(self.idxFile, 'rb') as inp:
+                raw = json.loads(inp.read().decode('utf-8'))
+            # Tuples are stored as arrays
+            self.key, self.game = tupled(raw['key']), tupled(raw.get('game'))
+            self.entries = {x: (tupled(y[0]), {z: tupled(y[1][z]) for z in y[1]}, y[2]) for x, y in raw['entries'].items()}
+            self.scripts = {x: (tupled(y[0]), y[1]) for x, y in raw.get('scripts', {}).items()}
+            install = raw.get('install')
+            self.install = (install[0], tuple(install[1]), tuple([tupled(x) for x in install[2]])) if install else None
+            self.launchers, self.sources = raw.get('launchers', {}), raw.get('sources', {})
+        except: self.key, self.entries, self.game, self.launchers, self.install, self.scripts, self.sources = None, {}, None, {}, None, {}, {}
+
+
+class scanEngine:
+    """Single pass os.scandir based scanner."""
+
+    def __init__(self, index=None, workers=None, timeout=None):
+        """Init."""
+        self.index = index
+        self.workers = workers if workers is not None else defs['scan.workers']
+        self.timeout = timeout if timeout is not None else defs['scan.timeout']
+        self.timedOut = []
+        self.failed = []
+        self.cancelled = False
+        self.lock = threading.Lock()
+        self.stats = stats
+        self.last = None
+        self.dirIndexes = {}  # Path: dirIndex
+        self.dirLock = threading.Lock()
+
+    def listDir(self, path):
+        """List a directory once, keeping the DirEntry objects (raises OSError)."""
+        stats.add(listings=1)
+        with os.scandir(path) as entries:
+            return list(entries)
+
+    def entrySig(self, entry):
+        """Return the (mtime, size) signature of a DirEntry."""
+        stats.add(stats=1)
+        try:
+            st = entry.stat()
+            return st.st_mtime_ns, st.st_size
+        except OSError: return None
+
+    def dirIndex(self, path, strict=False):
+        """Return the case-folded index of a directory, relisting it only when its mtime changed.
+
+        An unreadable directory is indexed as empty, unless strict (then OSError is raised).
+        """
+        key = os.path.normcase(os.path.abspath(path))
+        sig = signature(path)
+        with self.dirLock: index = self.dirIndexes.get(key)
+        if index is not None and sig is not None and index.sig == sig: return index
+        index = dirIndex(path, sig)
+        try: entries = self.listDir(path)
+        except OSError:
+            if strict: raise
+            entries = []
+        for entry in entries:
+            try: isDir = entry.is_dir()  # Served from the cached entry type
+            except OSError: continue
+            if isDir: index.dirs[entry.name.casefold()] = entry.name
+            else: index.files[entry.name.casefold()] = entry.name
+        with self.dirLock: self.dirIndexes[key] = index
+        return index
+
+    def scanRoot(self, path):
+        """Index the contents of a directory."""
+        return scanResult(path, self.dirIndex(path))
+
+    def scanModDir(self, path, parser):
+        """List a mod dir once and parse its launch scripts (unchanged scripts are served from the index)."""
+        scripts, launchers, index = {}, {}, self.index
+        order = list(formats)  # Registered formats, dispatched within the single listing
+        found = [(order.index(os.path.splitext(x.name)[1].lower()), x.name, x) for x in self.listDir(path)
+            if os.path.splitext(x.name)[1].lower() in formats]
+        for priority, fname, entry in sorted(found, key=lambda x: x[:2]):
+            sig = scripts[entry.path] = self.entrySig(entry)
+            cmds = index.script(entry.path, sig) if index is not None else None
+            if cmds is None:
+                cmds = parser(entry.path)  # None if skipped
+                if cmds is not None and index is not None: index.rememberScript(entry.path, sig, cmds)
+            if cmds: launchers.setdefault('%s%s' % (defs['list.spc'], os.path.splitext(fname)[0]), cmds)
+        return scripts, launchers
+
+    def scanModTask(self, modPath, parser, started):
+        """Pool task: serve a mod dir from the index or list and parse it."""
+        started[modPath] = time.monotonic()
+        index = self.index
+        dirSig = signature(modPath) if index is not None else None
+        launchers = index.lookup(modPath, dirSig) if index is not None else None
+        if launchers is not None: return modPath, (dirSig, None, launchers)
+        return modPath, (dirSig,)+self.scanModDir(modPath, parser)
+
+    def modDirs(self, index, exclude):
+        """Return the mod dir paths of an indexed root."""
+        return [os.path.normpath(x[1]) for x in index.iterDirs() if x[0] not in ('base', 'd3xp')
+            and os.path.normcase(os.path.abspath(x[1])) not in exclude]
+
+    def scanRootTask(self, root, exclude, started):
+        """Pool task: list an extra mod library root."""
+        started[root] = time.monotonic()
+        return self.modDirs(self.dirIndex(root, True), exclude)
+
+    def iterModDirs(self, modDirs, parser, cancel=None, deadline=None, roots=(), exclude=()):
+        """Scan mod dirs (and list extra roots) on a bounded thread pool, yielding mod dirs as they complete.
+
+        Dirs and roots exceeding the timeout or failing to list (offline drives, lost permissions) are reported
+        as skipped and served stale from the index, so they are not pruned.
+        """
+        started, self.timedOut, self.failed = {}, [], []
+        if not modDirs and not roots: return
+        pool = daemonPool(max(1, self.workers), 'scanMods')
+        pending = {pool.submit(self.scanModTask, x, parser, started): x for x in modDirs}
+        pending.update({pool.submit(self.scanRootTask, x, exclude, started): x for x in roots})
+        try:
+            while pending:
+                if (cancel is not None and cancel.is_set()) or (deadline is not None and time.monotonic() > deadline):
+                    self.cancelled = True
+                    return
+                finished = wait(pending, timeout=0.05, return_when=FIRST_COMPLETED)[0]
+                for future in finished:
+                    path = pending.pop(future)
+                    try: result = future.result()
+                    except OSError as err:  # Unreadable dir or root, keep what the index has
+                        cache['scan.skipped'][path] = err.strerror or str(err)
+                        self.failed.append(path)
+                        continue
+                    cache['scan.skipped'].pop(path, None)
+                    if path in roots: pending.update({pool.submit(self.scanModTask, x, parser, started): x for x in result})
+                    else: yield result
+                now = time.monotonic()
+                for future in [x for x in pending if now-started.get(pending[x], now) > self.timeout]:
+                    self.timedOut.append(pending.pop(future))
+                    cache['scan.skipped'][self.timedOut[-1]] = 'timed out'
+        finally: pool.shutdown()
+        entries = self.index.entries if self.index is not None else {}
+        for path in self.timedOut+self.failed:  # Mod dirs, or all known mod dirs of a root
+            for modPath in [path] if path not in roots else [x for x in list(entries) if os.path.dirname(x) == path]:
+                entry = entries.get(modPath)
+                if entry is not None: yield modPath, (entry[0], None, entry[2])
+
+    def iterScan(self, path, parser, exclude=(), cancel=None, budget=None, roots=()):
+        """Stream a scan of a game dir and extra mod library roots: the scanResult first, then (mod dir, launchers) as found.
+
+        A cancelled or over budget scan stops early and does not replace the last scan.
+        """
+        with self.lock:
+            stats.reset()
+            self.cancelled = False
+            deadline = time.monotonic()+budget if budget is not None else None
+            result = self.scanRoot(path)
+            yield result
+            if result.index.findFile(defs['game.exe']) is None: return
+            exclude = [os.path.normcase(os.path.abspath(x)) for x in exclude]
+            known = [os.path.normcase(os.path.abspath(path))]
+            for root in roots:
+                if os.path.normcase(os.path.abspath(root)) in known: continue
+                known.append(os.path.normcase(os.path.abspath(root)))
+                result.roots.append(os.path.normpath(root))
+            index = self.index
+            if index is not None: index.validate((INDEX_VERSION, defs['game.exe'], defs['game.server']))
+            try:
+                for modPath, (dirSig, scripts, launchers) in self.iterModDirs(self.modDirs(result.index, exclude),
+                        parser, cancel, deadline, result.roots[1:], exclude):
+                    if scripts is not None and index is not None: index.update(modPath, dirSig, scripts, launchers)
+                    result.launchers[modPath] = launchers
+                    yield modPath, launchers
+                if self.cancelled: return
+                if index is not None: index.prune(result.launchers)
+                self.last = result
+            finally:
+                if index is not None: index.store()
+
+    def iterRefresh(self, paths, parser):
+        """Stream a rescan of only the given mod dirs of the last scan."""
+        with self.lock:
+            stats.reset()
+            self.cancelled = False
+            result, index = self.last, self.index
+            yield result
+            for modPath in [os.path.normpath(x) for x in paths]:
+                if modPath not in result.launchers: continue
+                dirSig = index.signature(modPath) if index is not None else None
+                try: scripts, launchers = self.scanModDir(modPath, parser)
+                except OSError as err:  # Keep its last launchers
+                    cache['scan.skipped'][modPath] = err.strerror or str(err)
+                    continue
+                cache['scan.skipped'].pop(modPath, None)
+                if index is not None: index.update(modPath, dirSig, scripts, launchers)
+                result.launchers[modPath] = launchers
+                yield modPath, launchers
+            if index is not None: index.store()
+
+    def scan(self, path, parser, exclude=(), roots=()):
+        """Scan a game dir, extra mod library roots and their mod dirs."""
+        stream = self.iterScan(path, parser, exclude, roots=roots)
+        result = next(stream)
+        [x for x in stream]
+        return result
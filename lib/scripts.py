@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+
+# d3Launcher, a Doom3/dhewm3 Launcher
+# Copyright (C) <2021~>  <Dimitrios Koukas>
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Launch Scripts Module.
+
+import os, re, json, shlex, codecs, functools, subprocess
+
+CHUNK = 4096
+BOMS = ((codecs.BOM_UTF8, 'utf-8-sig'), (codecs.BOM_UTF16_LE, 'utf-16'), (codecs.BOM_UTF16_BE, 'utf-16'))
+VARIABLE = re.compile(r'%%|%~dp0|%~f0|%0|%([^%\s]+)%', re.IGNORECASE)
+SKIP = ('rem', 'echo', 'pause', 'exit', 'cls', 'title', 'color', 'goto', 'if', 'for', 'setlocal', 'endlocal', 'popd', 'shift')
+SH_VARIABLE = re.compile(r'\$\(\s*dirname\s+"?\$0"?\s*\)|`\s*dirname\s+"?\$0"?\s*`|\$\{0%/\*\}|\$\{(\w+)\}|\$(\w+|[@*])')
+SH_ARGS = re.compile(r'(?<!\S)"\$(?:[@*]|\{[@*]\})"(?!\S)')  # "$@" as a whole word: no arguments, not an empty one
+SH_SKIP = ('echo', 'exit', 'set', 'unset', 'read', 'sleep', 'if', 'then', 'else', 'fi', 'for', 'do', 'done', 'cd', 'pushd', 'popd', 'trap')
+SH_SEPARATORS = (';', '&', '&&', '|', '||')
+DESKTOP_CODES = re.compile(r'%[fFuUdDnNickvm]')
+LEADING_EXE = re.compile(r'\s*([^"\s+-](?:(?!\s[+-])[^"])*?\.exe)(?=\s|$)', re.IGNORECASE)  # Unquoted executable path before any +/- argument
+
+
+class scriptSkip(Exception):
+    """A script that was not parsed, with the reason."""
+
+
+class scriptCmd:
+    """A game command parsed from a launch script (always run from the game dir, so scripts' working dirs are ignored)."""
+
+    __slots__ = ('exe', 'args')
+
+    def __init__(self, exe, args):
+        """Init."""
+        self.exe = exe
+        self.args = args
+
+    def line(self):
+        """Return the command as a (quoted) command line."""
+        return subprocess.list2cmdline([self.exe]+self.args)
+
+    def __eq__(self, other):
+        """Compare commands."""
+        return isinstance(other, scriptCmd) and (self.exe, self.args) == (other.exe, other.args)
+
+    def __repr__(self):
+        """Debug representation."""
+        return 'scriptCmd(%r, %r)' % (self.exe, self.args)
+
+
+def detectEncoding(head):
+    """Guess the encoding of a script from its first chunk."""
+    for bom, encoding in BOMS:
+        if head.startswith(bom): return encoding
+    if b'\0' in head:
+        # UTF-16 without BOM has a NUL in every other byte of ASCII text
+        if head[1::2].count(0) > len(head)//4: return 'utf-16-le'
+        if head[0::2].count(0) > len(head)//4: return 'utf-16-be'
+        raise scriptSkip('binary file')
+    try: codecs.getincrementaldecoder('utf-8')().decode(head, False)
+    except UnicodeDecodeError: return 'cp1252'
+    return 'utf-8'
+
+
+def isNoise(line, noise):
+    """Check if a line can not be a command, noise being (first words, first word prefixes)."""
+    word = line.strip().lstrip('@').split(None, 1)
+    if not word: return True
+    word = word[0].lower()
+    return word in noise[0] or word.startswith(noise[1])
+
+
+def readScript(fpath, maxBytes=65536, maxLines=2000, noise=(('rem',), (':', 'echo')), cont='^'):
+    """Stream the lines of a script that may be commands.
+
+    Reads at most maxBytes/maxLines, raising scriptSkip beyond them or on
+    binary content. Blank and noise (comment, label, echo) lines are dropped
+    along with their continuations.
+    """
+    with open(fpath, 'rb') as inp:
+        head = inp.read(min(CHUNK, maxBytes+1))
+        decoder = codecs.getincrementaldecoder(detectEncoding(head))('replace')
+        size, count, pending, keep, chunk = 0, 0, '', None, head
+        while chunk:
+            size += len(chunk)
+            if size > maxBytes: raise scriptSkip('over %s bytes' % maxBytes)
+            lines = (pending+decoder.decode(chunk)).split('\n')
+            pending = lines.pop()
+            chunk = inp.read(CHUNK)
+            if not chunk: lines.append(pending+decoder.decode(b'', True))
+            for line in lines:
+                count += 1
+                if count > maxLines: raise scriptSkip('over %s lines' % maxLines)
+                if keep is None: keep = not isNoise(line, noise)  # Not a continued line
+                if keep: yield line
+                carets = len(line.rstrip('\r'))-len(line.rstrip('\r').rstrip(cont))
+                if not carets % 2: keep = None
+
+
+@functools.lru_cache(maxsize=None)
+def splitCmd(line):
+    """Split a command line to an argv tuple, the inverse of subprocess.list2cmdline.
+
+    Follows the Windows C runtime rules: double quotes group, backslashes are
+    literal unless they precede a quote.
+    """
+    argv, buf, quoted, inArg, pos = [], [], False, False, 0
+    while pos < len(line):
+        char = line[pos]
+        if char == '\\':
+            slashes = len(line[pos:])-len(line[pos:].lstrip('\\'))
+            pos += slashes
+            if line[pos:pos+1] == '"':
+                buf.append('\\'*(slashes//2))
+                if slashes % 2:
+                    buf.append('"')
+                    pos += 1
+            else: buf.append('\\'*slashes)
+            inArg = True
+            continue
+        if char == '"':
+            quoted, inArg = not quoted, True
+        elif char.isspace() and not quoted:
+            if inArg: argv.append(''.join(buf))
+            buf, inArg = [], False
+        else:
+            buf.append(char)
+            inArg = True
+        pos += 1
+    if inArg: argv.append(''.join(buf))
+    return tuple(argv)
+
+
+def compileCmd(line, gameDir):
+    """Compile a command line to an argv list, bare executables resolved in the game dir.
+
+    An unquoted executable path with spaces (C:\\Program Files\\dhewm3\\dhewm3.exe +x, as old custom launchers
+    hold) is kept whole, the way CreateProcess resolves it.
+    """
+    match = LEADING_EXE.match(line)
+    if match and re.search(r'\s', match.group(1)) and re.search(r'[\\/]', match.group(1)):
+        argv = [match.group(1)]+list(splitCmd(line[match.end():]))
+    else: argv = list(splitCmd(line))
+    if gameDir and argv and not os.path.isabs(argv[0]) and not os.path.dirname(argv[0]): argv[0] = os.path.join(gameDir, argv[0])
+    return argv
+
+
+def joinLines(lines, cont='^'):
+    """Join lines continued with a trailing (unescaped) caret (or backslash)."""
+    buf = ''
+    for line in lines:
+        line = line.rstrip('\r\n')
+        carets = len(line)-len(line.rstrip(cont))
+        if carets % 2:
+            buf += line[:-1]
+            continue
+        yield buf+line
+        buf = ''
+    if buf: yield buf
+
+
+def expand(line, variables, fpath):
+    """Expand %% escapes, script path and set variables."""
+    def sub(match):
+        token = match.group(0).lower()
+        if token == '%%': return '%'
+        if token == '%~dp0': return os.path.dirname(os.path.abspath(fpath))+os.sep
+        if token in ('%~f0', '%0'): return os.path.abspath(fpath)
+        name = match.group(1)
+        return variables.get(name.upper(), os.environ.get(name, match.group(0)))
+    return VARIABLE.sub(sub, line)
+
+
+def tokenize(line):
+    """Split a command line to commands of (token, quoted) pairs.
+
+    Honours double quotes (single quotes too when they open a token, as mod
+    scripts use them for Doom 3 arguments), caret escapes, the &, &&, ||
+    separators and drops redirections (<, >, >>, with an optional handle
+    digit before them and &N handle targets, as in 2>&1).
+    """
+    cmds, tokens, buf, quote, quoted, redirect = [], [], [], None, False, False
+    def flush():
+        nonlocal buf, quoted, redirect
+        if buf or quoted:
+            if not redirect: tokens.append((''.join(buf), quoted))
+            redirect = False
+        buf, quoted = [], False
+    pos = 0
+    while pos < len(line):
+        char = line[pos]
+        if quote:
+            if char == quote: quote = None
+            else: buf.append(char)
+        elif char == '"' or (char == "'" and not buf):
+            quote, quoted = char, True
+        elif char == '^' and pos+1 < len(line):
+            pos += 1
+            buf.append(line[pos])
+        elif char.isspace(): flush()
+        elif char in '&|':
+            flush()
+            if tokens: cmds.append(tokens)
+            tokens = []
+            if line[pos+1:pos+2] == char: pos += 1
+        elif char in '<>':
+            if len(buf) == 1 and buf[0].isdigit() and not quoted: buf = []  # Handle, as in 2>nul
+            flush()
+            redirect = True
+            if char == '>' and line[pos+1:pos+2] == '>': pos += 1
+            if line[pos+1:pos+2] == '&': pos += 1  # Handle target, as in 2>&1
+        else: buf.append(char)
+        pos += 1
+    flush()
+    if tokens: cmds.append(tokens)
+    return cmds
+
+
+def parseBatch(fpath, lines, exes):
+    """Parse a batch file to the game commands it runs.
+
+    exes maps case-folded executable names to the names to launch them with.
+    """
+    cmds, variables = [], {}
+    for line in joinLines(lines):
+        line = line.strip().lstrip('@').strip()
+        if not line or line.startswith('::') or line.startswith(':'): continue
+        for tokens in tokenize(expand(line, variables, fpath)):
+            words = [x[0] for x in tokens]
+            verb = words[0].lower()
+            if verb in SKIP: break  # Rest of the line belongs to the skipped command
+            if verb == 'set':
+                assignment = ' '.join(words[1:])
+                if '=' in assignment and not assignment.startswith('/'):
+                    name, value = assignment.split('=', 1)
+                    variables[name.strip().upper()] = value
+                continue
+            if verb in ('cd', 'chdir', 'pushd'): continue
+            if verb == 'call': tokens = tokens[1:]
+            elif verb == 'start':
+                tokens = tokens[1:]
+                if tokens and tokens[0][1]: tokens = tokens[1:]  # Window title
+                while tokens and tokens[0][0].startswith('/'):
+                    if tokens[0][0].lower() == '/d': tokens = tokens[1:]  # And its working dir argument
+                    tokens = tokens[1:]
+            cmd = gameCmd([x[0] for x in tokens], exes)
+            if cmd is not None: cmds.append(cmd)
+    return cmds
+
+
+def gameCmd(words, exes):
+    """Return a scriptCmd if words run a game executable, else None."""
+    if not words: return None
+    exe = os.path.basename(words[0].replace('\\', '/')).casefold()
+    if exe in exes: return scriptCmd(exes[exe], list(words[1:]))
+
+
+def parseShell(fpath, lines, exes):
+    """Parse a POSIX shell script to the game commands it runs."""
+    cmds, variables = [], {}
+    here = os.path.dirname(os.path.abspath(fpath))
+    def sub(match):
+        if match.group(1) is None and match.group(2) is None: return here  # dirname of $0
+        name = match.group(1) or match.group(2)
+        if name in ('@', '*'): return ''
+        if name == '0': return os.path.abspath(fpath)
+        return variables.get(name, os.environ.get(name, ''))
+    for line in joinLines(lines, '\\'):
+        line = line.strip()
+        if not line or line.startswith('#'): continue
+        try:
+            lexer = shlex.shlex(SH_VARIABLE.sub(sub, SH_ARGS.sub('', line)), posix=True, punctuation_chars=';&|')
+            lexer.whitespace_split = True
+            tokens = list(lexer)
+        except ValueError: continue  # Unbalanced quotes
+        words = []
+        for token in tokens+[';']:
+            if token not in SH_SEPARATORS:
+                words.append(token)
+                continue
+            while words and re.match(r'^\w+=', words[0]):  # Assignments
+                name, value = words.pop(0).split('=', 1)
+                variables[name] = value
+            if words and words[0] in ('exec', 'nohup', 'command'): words = words[1:]
+            if words and words[0] == 'export':
+                variables.update([x.split('=', 1) for x in words[1:] if '=' in x])
+            elif words and words[0] not in SH_SKIP:
+                cmd = gameCmd(words, exes)
+                if cmd is not None: cmds.append(cmd)
+            words = []
+    return cmds
+
+
+def parseDesktop(fpath, lines, exes):
+    """Parse a freedesktop .desktop entry to the game command it runs."""
+    section, execLine = None, None
+    for line in lines:
+        line = line.strip()
+        if line.startswith('['): section = line
+        elif section == '[Desktop Entry]' and '=' in line:
+            key, value = [x.strip() for x in line.split('=', 1)]
+            if key == 'Exec': execLine = value
+    if execLine is None: return []
+    try: words = shlex.split(DESKTOP_CODES.sub('', execLine).replace('%%', '%'))
+    except ValueError: return []
+    cmd = gameCmd(words, exes)
+    return [cmd] if cmd is not None else []
+
+
+def parseManifest(fpath, lines, exes):
+    """Parse a d3Launcher manifest (JSON: {"commands": [...]}).
+
+    Commands are command lines or argument lists.
+    """
+    try: manifest = json.loads('\n'.join(lines))
+    except ValueError as err: raise scriptSkip('invalid manifest: %s' % err)
+    if not isinstance(manifest, dict): raise scriptSkip('invalid manifest')
+    if not isinstance(manifest.get('commands', []), list): raise scriptSkip('invalid manifest: commands is not a list')
+    for cmd in manifest.get('commands', []):
+        if not isinstance(cmd, str) and not (isinstance(cmd, list) and all([isinstance(x, str) for x in cmd])):
+            raise scriptSkip('invalid manifest: a command is neither a command line nor a list of arguments')
+    cmds = []
+    for cmd in manifest.get('commands', []):
+        try: words = cmd if isinstance(cmd, list) else shlex.split(cmd, posix=False)
+        except ValueError: continue
+        cmd = gameCmd([x.strip('"') for x in words], exes)
+        if cmd is not None: cmds.append(cmd)
+    return cmds
+
+
+class scriptFormat:
+    """A launch script format: its parser and how its lines are read."""
+
+    __slots__ = ('parse', 'noise', 'cont')
+
+    def __init__(self, parse, noise=((), ()), cont='\\'):
+        """Init."""
+        self.parse = parse
+        self.noise = noise
+        self.cont = cont
+
+
+formats = {}  # Extension: scriptFormat, by precedence on title clashes
+
+
+def register(ext, fmt):
+    """Register a launch script format."""
+    formats[ext.lower()] = fmt
+
+
+def isScript(name):
+    """Check if a file name is a launch script of a registered format."""
+    return os.path.splitext(name)[1].lower() in formats
+
+
+def parseScript(fpath, exes, maxBytes=65536, maxLines=2000):
+    """Parse a launch script of any registered format to scriptCmd records."""
+    fmt = formats[os.path.splitext(fpath)[1].lower()]
+    return fmt.parse(fpath, readScript(fpath, maxBytes, maxLines, fmt.noise, fmt.cont), exes)
+
+
+register('.d3l', scriptFormat(parseManifest))
+register('.bat', scriptFormat(parseBatch, (('rem',), (':', 'echo')), '^'))
+register('.cmd', scriptFormat(parseBatch, (('rem',), (':', 'echo')), '^'))
+register('.sh', scriptFormat(parseShell, (('echo',), ('#',)), '\\'))
+register('.desktop', scriptFormat(parseDesktop, ((), ('#',)), ''))
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+
+# d3Launcher, a Doom3/dhewm3 Launcher
+# Copyright (C) <2021~>  <Dimitrios Koukas>
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Search Module.
+
+import bisect
+
+
+def trigrams(text):
+    """Three letter substrings of a text."""
+    return {text[x:x+3] for x in range(len(text)-2)}
+
+
+class textIndex:
+    """Case-insensitive search over a few short texts per key.
+
+    Prefix matches come from a sorted list (bisect), substring matches from a trigram index. Both are kept
+    current one key at a time.
+    """
+
+    def __init__(self):
+        """Init."""
+        self.texts = {}  # Key: folded texts
+        self.sorted = []  # (folded text, key), sorted
+        self.grams = {}  # Trigram: keys
+
+    def __len__(self):
+        """Keys."""
+        return len(self.texts)
+
+    def fold(self, texts):
+        """Normalize the texts of a key."""
+        return tuple(sorted({x.casefold() for x in texts if x}))
+
+    def build(self, items):
+        """Replace the index content ({key: texts})."""
+        self.texts = {x: self.fold(items[x]) for x in items}
+        self.sorted = sorted([(text, x) for x in self.texts for text in self.texts[x]])
+        self.grams = {}
+        for key in self.texts:
+            for text in self.texts[key]:
+                [self.grams.setdefault(gram, set()).add(key) for gram in trigrams(text)]
+
+    def add(self, key, texts):
+        """Index (or re-index) a key."""
+        folded = self.fold(texts)
+        if self.texts.get(key) == folded: return
+        self.remove(key)
+        self.texts[key] = folded
+        for text in folded:
+            bisect.insort(self.sorted, (text, key))
+            [self.grams.setdefault(gram, set()).add(key) for gram in trigrams(text)]
+
+    def remove(self, key):
+        """Drop a key."""
+        folded = self.texts.pop(key, None)
+        if folded is None: return
+        for text in folded:
+            pos = bisect.bisect_left(self.sorted, (text, key))
+            if pos < len(self.sorted) and self.sorted[pos] == (text, key): del self.sorted[pos]
+            for gram in trigrams(text):
+                keys = self.grams[gram]
+                keys.discard(key)
+                if not keys: del self.grams[gram]
+
+    def prefix(self, query):
+        """Keys with a text starting with query."""
+        query = query.casefold()
+        start = bisect.bisect_left(self.sorted, (query,))
+        end = bisect.bisect_left(self.sorted, (query+'\U0010ffff',), start)
+        return {x[1] for x in self.sorted[start:end]}
+
+    def search(self, query, skip=()):
+        """Keys with a text containing query (except those in skip)."""
+        query = query.casefold()
+        grams = trigrams(query)
+        if not grams: candidates = self.texts.keys()-skip  # Too short for trigrams
+        else:
+            sets = sorted([self.grams.get(x, set()) for x in grams], key=len)
+            candidates = sets[0].intersection(*sets[1:]).difference(skip)
+        return {x for x in candidates if any([query in text for text in self.texts[x]])}
@@ -21,4 +21,7 @@
 MainFrame = None
 systray = None
 confLib = None
+scanIndex = None
+scanEngine = None
+catalog = None
 app = None
\ No newline at end of file
@@ -0,0 +1,345 @@
+# -*- coding: utf-8 -*-
+
+# d3Launcher, a Doom3/dhewm3 Launcher
+# Copyright (C) <2021~>  <Dimitrios Koukas>
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Store Module.
+
+import os, json, pickle, hashlib, threading, contextlib
+from collections.abc import MutableMapping
+if os.name == 'nt': import msvcrt
+else: import fcntl
+
+CONF_FORMAT = 'd3launcher.conf'
+CONF_VERSION = 1
+LAZY_SECTIONS = ('custom.launchers',)
+
+
+def atomicWrite(path, data, sync=True):
+    """Write data to a temp file beside path and rename it over path (never leaves a partial file)."""
+    tmp = '%s.%s-%s.tmp' % (path, os.getpid(), threading.get_ident())
+    with open(tmp, 'wb') as out:
+        out.write(data)
+        if sync:
+            out.flush()
+            os.fsync(out.fileno())
+    os.replace(tmp, path)
+    if sync and hasattr(os, 'O_DIRECTORY'):  # Persist the rename (POSIX)
+        fd = os.open(os.path.dirname(path) or '.', os.O_RDONLY|os.O_DIRECTORY)
+        try: os.fsync(fd)
+        finally: os.close(fd)
+
+
+def fileHash(path):
+    """SHA-1 digest of a file's content, None if unreadable."""
+    try:
+        with open(path, 'rb') as inp:
+            return hashlib.sha1(inp.read()).digest()
+    except OSError: return None
+
+
+class lazySection(MutableMapping):
+    """A config section kept as JSON text until first used, written back verbatim if never touched."""
+
+    __slots__ = ('raw', 'data')
+
+    def __init__(self, raw='{}'):
+        """Init."""
+        self.raw = raw
+        self.data = None
+
+    def materialize(self):
+        """Decode the section."""
+        if self.data is None: self.data, self.raw = json.loads(self.raw), None
+        return self.data
+
+    def __getitem__(self, key): return self.materialize()[key]
+    def __setitem__(self, key, value): self.materialize()[key] = value
+    def __delitem__(self, key): del self.materialize()[key]
+    def __iter__(self): return iter(self.materialize())
+    def __len__(self): return len(self.materialize())
+    def __contains__(self, key): return key in self.materialize()
+
+    def dumps(self):
+        """JSON text of the section."""
+        return self.raw if self.data is None else json.dumps(self.data, ensure_ascii=False)
+
+
+class legacyUnpickler(pickle.Unpickler):
+    """Unpickler for the old .pkl settings: plain containers only, no globals (nothing executable)."""
+
+    def find_class(self, module, name):
+        """Refuse any class or function reference."""
+        raise pickle.UnpicklingError('Forbidden global %s.%s' % (module, name))
+
+
+def migrate0(raw):
+    """Version 0 (pickled conf dict) to 1: lists instead of tuples, string launcher commands."""
+    raw = dict(raw)
+    if 'launch.exclusions' in raw: raw['launch.exclusions'] = list(raw['launch.exclusions'])
+    if 'custom.launchers' in raw: raw['custom.launchers'] = {x: [str(y) for y in raw['custom.launchers'][x]] for x in raw['custom.launchers']}
+    return raw
+
+
+MIGRATIONS = {0: migrate0}
+
+
+def migrate(raw, version):
+    """Upgrade settings from an older format version."""
+    if version > CONF_VERSION: raise ValueError('Settings version %s is newer than %s' % (version, CONF_VERSION))
+    while version < CONF_VERSION:
+        raw = MIGRATIONS[version](raw)
+        version += 1
+    return raw
+
+
+def loadLegacy(path):
+    """Load the old pickled settings, migrated to the current version."""
+    with open(path, 'rb') as inp:
+        raw = legacyUnpickler(inp).load()
+    if not isinstance(raw, dict): raise pickle.UnpicklingError('Not a settings dict')
+    return migrate(raw, 0)
+
+
+def dumpConf(conf):
+    """Encode settings: a JSON header line, then one 'name json' line per lazy section."""
+    header = {x: conf[x] for x in conf if x not in LAZY_SECTIONS}
+    lines = [json.dumps({'format': CONF_FORMAT, 'version': CONF_VERSION, 'conf': header}, ensure_ascii=False)]
+    for x in LAZY_SECTIONS:
+        if x not in conf: continue
+        section = conf[x] if isinstance(conf[x], lazySection) else lazySection(json.dumps(conf[x], ensure_ascii=False))
+        lines.append('%s %s' % (x, section.dumps()))
+    return ('\n'.join(lines)+'\n').encode('utf-8')
+
+
+def loadConf(data):
+    """Decode settings, lazy sections left undecoded."""
+    lines = data.decode('utf-8').splitlines()
+    header = json.loads(lines[0]) if lines else {}
+    if not isinstance(header, dict) or header.get('format') != CONF_FORMAT: raise ValueError('Not a settings file')
+    raw = dict(header['conf'])
+    for line in lines[1:]:
+        name, sep, text = line.partition(' ')
+        if not (sep and text.startswith('{') and text.endswith('}')): raise ValueError('Damaged section %s' % name)
+        raw[name] = lazySection(text)
+    if header['version'] != CONF_VERSION:  # Older layouts are migrated whole
+        raw = migrate({x: dict(raw[x]) if isinstance(raw[x], lazySection) else raw[x] for x in raw}, header['version'])
+    return raw
+
+
+def sameValue(a, b):
+    """Compare settings values, untouched lazy sections by their text."""
+    if isinstance(a, lazySection) and isinstance(b, lazySection) and a.data is None and b.data is None: return a.raw == b.raw
+    return a == b
+
+
+def applyOp(conf, op):
+    """Apply a journal record to the settings. Records are idempotent, so replaying ones already in the snapshot is harmless."""
+    kind, key = op[0], op[1]
+    if kind == 'set': conf[key] = op[2]
+    elif kind == 'put': conf[key][op[2]] = op[3]
+    elif kind == 'del': conf[key].pop(op[2], None)
+    elif kind == 'add':
+        if op[2] not in conf[key]: conf[key].append(op[2])
+    elif kind == 'rm': conf[key] = [x for x in conf[key] if x != op[2]]
+
+
+class fileLock:
+    """Advisory lock shared by all instances through a lock file (re-entrant within an instance)."""
+
+    def __init__(self, path):
+        """Init."""
+        self.path = path
+        self.lock = threading.RLock()
+        self.depth = 0
+        self.fd = None
+
+    def __enter__(self):
+        """Acquire (blocks while another instance holds it)."""
+        self.lock.acquire()
+        if not self.depth:
+            self.fd = os.open(self.path, os.O_RDWR|os.O_CREAT)
+            if os.name == 'nt':
+                while True:
+                    try:
+                        msvcrt.locking(self.fd, msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError: continue  # LK_LOCK gives up after ~10s
+            else: fcntl.flock(self.fd, fcntl.LOCK_EX)
+        self.depth += 1
+        return self
+
+    def __exit__(self, *args):
+        """Release."""
+        self.depth -= 1
+        if not self.depth:
+            if os.name == 'nt':
+                os.lseek(self.fd, 0, os.SEEK_SET)
+                msvcrt.locking(self.fd, msvcrt.LK_UNLCK, 1)
+            else: fcntl.flock(self.fd, fcntl.LOCK_UN)
+            os.close(self.fd)
+            self.fd = None
+        self.lock.release()
+
+
+class confJournal:
+    """Append-only log of settings changes, one JSON record per line, kept beside the snapshot.
+
+    Shared by all instances: each one tails it from the position it has applied so far. A compaction
+    replaces the file, which tells tailing instances to resync from the snapshot.
+    """
+
+    def __init__(self, path, lock, durability='flush'):
+        """Init."""
+        self.path = path
+        self.lock = lock
+        self.durability = durability
+        self.ident = None  # Journal file applied so far and up to where
+        self.pos = 0
+
+    def stat(self):
+        """Journal file identity and size."""
+        try: st = os.stat(self.path)
+        except OSError: return None, 0
+        return (st.st_dev, st.st_ino), st.st_size
+
+    def size(self):
+        """Journal size in bytes."""
+        return self.stat()[1]
+
+    def append(self, op):
+        """Log a change."""
+        with self.lock:
+            caughtUp = self.stat() == (self.ident, self.pos)
+            with open(self.path, 'ab') as out:
+                out.write((json.dumps(op, ensure_ascii=False)+'\n').encode('utf-8'))
+                if self.durability == 'always':
+                    out.flush()
+                    os.fsync(out.fileno())
+            if caughtUp: self.ident, self.pos = self.stat()
+
+    def records(self, data):
+        """Decode records, skipping a torn or unusable one."""
+        for line in data.decode('utf-8', 'replace').splitlines():
+            try: yield json.loads(line)
+            except ValueError: continue
+
+    def apply(self, conf, ops):
+        """Apply records to settings, returning the keys touched."""
+        keys = set()
+        for op in ops:
+            try: applyOp(conf, op)
+            except (LookupError, TypeError, AttributeError): continue
+            keys.add(op[1])
+        return keys
+
+    def replay(self, conf, track=True):
+        """Apply the whole journal, tracking it as applied unless told otherwise."""
+        with self.lock:
+            ident, size = self.stat()
+            try:
+                with open(self.path, 'rb') as inp:
+                    data = inp.read(size)
+            except OSError: data = b''
+            if track: self.ident, self.pos = ident, len(data)
+            return self.apply(conf, self.records(data))
+
+    def read(self):
+        """Records other instances appended since the last read, None if the journal was compacted since."""
+        with self.lock:
+            ident, size = self.stat()
+            if ident != self.ident or size < self.pos: return None
+            if size == self.pos: return []
+            with open(self.path, 'rb') as inp:
+                inp.seek(self.pos)
+                data = inp.read(size-self.pos)
+            data = data[:data.rfind(b'\n')+1]  # Whole records only
+            self.pos += len(data)
+            return list(self.records(data))
+
+    def reset(self):
+        """Empty the journal once folded into the snapshot (call holding the lock)."""
+        caughtUp = self.stat() == (self.ident, self.pos)
+        atomicWrite(self.path, b'', self.durability == 'always')
+        if caughtUp: self.ident, self.pos = self.stat()
+
+    def flush(self):
+        """Persist the journal (on exit)."""
+        if self.durability == 'never': return
+        with self.lock:
+            try:
+                with open(self.path, 'ab') as out:
+                    os.fsync(out.fileno())
+            except OSError: pass
+
+
+class debouncedWriter:
+    """Coalesce bursts of writes to a file into one atomic write per window.
+
+    Durability policy: 'always' fsyncs every write, 'flush' only synchronous flushes, 'never' none.
+    """
+
+    def __init__(self, path, delay=0.5, durability='flush', lock=None):
+        """Init."""
+        self.path = path
+        self.fileLock = lock or contextlib.nullcontext()
+        self.delay = delay
+        self.durability = durability
+        self.lock = threading.Lock()
+        self.pending = None
+        self.after = None
+        self.timer = None
+        self.requested = 0
+        self.performed = 0
+
+    def write(self, data, after=None):
+        """Queue data (or a callable producing it when written), written once the window closes.
+
+        After is called once it is on disk, both under the file lock.
+        """
+        with self.lock:
+            self.requested += 1
+            self.pending = data
+            self.after = after
+            if self.timer is None:
+                self.timer = threading.Timer(self.delay, self.commit)
+                self.timer.daemon = True
+                self.timer.start()
+
+    def commit(self, sync=None):
+        """Write the pending data now."""
+        with self.lock:
+            if self.timer is not None: self.timer.cancel()
+            data, after, self.pending, self.after, self.timer = self.pending, self.after, None, None, None
+            if data is None: return False
+            if sync is None: sync = self.durability == 'always'
+            try:
+                with self.fileLock:
+                    atomicWrite(self.path, data() if callable(data) else data, sync)
+                    if after is not None: after()
+            except (OSError, ValueError):
+                self.pending, self.after = data, after  # Retried on the next write or flush
+                return False
+            self.performed += 1
+            return True
+
+    def flush(self):
+        """Synchronously write anything pending (on exit)."""
+        return self.commit(self.durability != 'never')
+
+    def __str__(self):
+        """Counters."""
+        return 'writes: %s requested, %s performed' % (self.requested, self.performed)
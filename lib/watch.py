@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+
+# d3Launcher, a Doom3/dhewm3 Launcher
+# Copyright (C) <2021~>  <Dimitrios Koukas>
+
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU Affero General Public License as published
+#   by the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU Affero General Public License for more details.
+
+#   You should have received a copy of the GNU Affero General Public License
+#   along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+# Watch Module.
+
+import os, sys, time, struct, select, threading, ctypes, ctypes.util
+from lib.conf import defs
+from lib.scan import isGameExe
+from lib.scripts import isScript
+
+# Inotify flags
+IN_MODIFY = 0x2
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_ONLYDIR = 0x1000000
+IN_ISDIR = 0x40000000
+IN_DIR_MASK = IN_CREATE|IN_DELETE|IN_MOVED_FROM|IN_MOVED_TO|IN_DELETE_SELF|IN_MOVE_SELF|IN_ONLYDIR
+IN_MOD_MASK = IN_DIR_MASK|IN_CLOSE_WRITE|IN_ATTRIB
+IN_FILE_MASK = IN_MODIFY|IN_CLOSE_WRITE|IN_CREATE|IN_DELETE|IN_MOVED_FROM|IN_MOVED_TO
+EVENT = struct.Struct('iIII')
+
+
+def inotifyInit():
+    """Return libc and a new inotify descriptor (Linux)."""
+    if not sys.platform.startswith('linux'): raise OSError('inotify is Linux only')
+    libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+    fd = libc.inotify_init1(os.O_NONBLOCK|os.O_CLOEXEC)
+    if fd < 0: raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+    return libc, fd
+
+
+def iterEvents(data):
+    """Parse inotify events to (watch descriptor, mask, name)."""
+    pos = 0
+    while pos < len(data):
+        wd, mask, cookie, size = EVENT.unpack_from(data, pos)
+        yield wd, mask, os.fsdecode(data[pos+EVENT.size:pos+EVENT.size+size].rstrip(b'\0'))
+        pos += EVENT.size+size
+
+
+class inotifyWatch:
+    """Inotify backend (Linux)."""
+
+    def __init__(self, root, exclude, engine):
+        """Init."""
+        self.libc, self.fd = inotifyInit()
+        self.root, self.exclude = root, exclude
+        self.wds = {}  # Watch descriptor: path
+        self.wake = os.pipe()  # Interrupts a wait
+        if self.addWatch(root, IN_DIR_MASK) is None:
+            self.close()
+            raise OSError('unable to watch %s' % root)
+        [self.addWatch(x, IN_MOD_MASK) for x in engine.modDirs(engine.dirIndex(root), exclude)]
+
+    def addWatch(self, path, mask):
+        """Watch a directory."""
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), mask)
+        if wd < 0: return None
+        self.wds[wd] = path
+        return wd
+
+    def wait(self, timeout):
+        """Return the paths changed within timeout (None blocks until a change or interrupt())."""
+        changed = set()
+        ready = select.select([self.fd, self.wake[0]], [], [], timeout)[0]
+        if self.fd not in ready: return changed
+        try: data = os.read(self.fd, 65536)
+        except BlockingIOError: return changed
+        for wd, mask, name in iterEvents(data):
+            path = self.wds.get(wd)
+            if mask & IN_Q_OVERFLOW: changed.add(self.root)
+            elif path is None: continue
+            elif path == self.root:
+                if mask & IN_ISDIR:
+                    if mask & (IN_CREATE|IN_MOVED_TO): self.addWatch(os.path.join(self.root, name), IN_MOD_MASK)
+                    changed.add(self.root)
+                elif isGameExe(name): changed.add(self.root)
+            elif mask & (IN_DELETE_SELF|IN_MOVE_SELF): self.wds.pop(wd, None)
+            elif not mask & IN_ISDIR and isScript(name): changed.add(path)
+        return changed
+
+    def interrupt(self):
+        """Wake a blocked wait."""
+        os.write(self.wake[1], b'\0')
+
+    def close(self):
+        """Release the descriptors."""
+        [os.close(x) for x in (self.fd,)+self.wake]
+
+
+class inotifyFile:
+    """Inotify watch of a single file (Linux), through its dir so replacements by rename are seen too."""
+
+    def __init__(self, path):
+        """Init."""
+        self.libc, self.fd = inotifyInit()
+        self.name = os.path.basename(path)
+        self.wake = os.pipe()  # Interrupts a wait
+        if self.libc.inotify_add_watch(self.fd, os.fsencode(os.path.dirname(os.path.abspath(path))), IN_FILE_MASK) < 0:
+            self.close()
+            raise OSError('unable to watch %s' % path)
+
+    def wait(self):
+        """Block until the file changes (True) or interrupt() is called (False)."""
+        while True:
+            ready = select.select([self.fd, self.wake[0]], [], [])[0]
+            if self.wake[0] in ready: return False
+            try: data = os.read(self.fd, 65536)
+            except BlockingIOError: continue
+            if any([mask & IN_Q_OVERFLOW or name == self.name for wd, mask, name in iterEvents(data)]): return True
+
+    def interrupt(self):
+        """Wake a blocked wait."""
+        os.write(self.wake[1], b'\0')
+
+    def close(self):
+        """Release the descriptors."""
+        [os.close(x) for x in (self.fd,)+self.wake]
+
+
+class pollWatch:
+    """Stat polling backend, backing off from interval to idle while nothing changes."""
+
+    def __init__(self, root, exclude, engine, halt, interval, idle):
+        """Init."""
+        self.root, self.exclude, self.engine, self.halt = root, exclude, engine, halt
+        self.wake = threading.Event()  # Polls now
+        self.base = self.interval = interval
+        self.idle = max(idle, interval)
+        self.snap = self.snapshot({})
+
+    def scripts(self, path):
+        """Return the signatures of a mod dir's scripts from a single listing (the DirEntry stats are free on Windows)."""
+        try: entries = self.engine.listDir(path)
+        except OSError: return None
+        return {x.path: self.engine.entrySig(x) for x in entries if isScript(x.name)}
+
+    def snapshot(self, prev):
+        """Stat the game dir and list each mod dir once (the game dir is shared with scans and only relisted when changed)."""
+        index = self.engine.dirIndex(self.root)
+        snap = {self.root: index.sig, 'dirs': self.engine.modDirs(index, self.exclude)}
+        snap.update({x: self.scripts(x) for x in snap['dirs']})
+        return snap
+
+    def wait(self, timeout):
+        """Return the paths changed within timeout (polled no more often than the current interval)."""
+        self.wake.wait(max(timeout or 0, self.interval))
+        self.wake.clear()
+        if self.halt.is_set(): return set()
+        snap, prev = self.snapshot(self.snap), self.snap
+        self.snap = snap
+        if snap[self.root] != prev[self.root] or snap['dirs'] != prev['dirs']: changed = {self.root}
+        else: changed = {x for x in snap['dirs'] if snap[x] != prev[x]}
+        self.interval = self.base if changed else min(self.interval*2, self.idle)
+        return changed
+
+    def interrupt(self):
+        """Poll now, at the base interval again."""
+        self.interval = self.base
+        self.wake.set()
+
+    def close(self):
+        """Nothing to release."""
+        pass
+
+
+class dirWatcher(threading.Thread):
+    """Watch the game dir and its mod dirs, reporting coalesced changes."""
+
+    def __init__(self, root, onChange, engine, exclude=(), delay=0.5, interval=None, idle=None):
+        """Init."""
+        threading.Thread.__init__(self, name='dirWatcher', daemon=True)
+        self.root = os.path.normpath(root)
+        self.onChange = onChange
+        self.engine = engine  # scanEngine, its dir indexes are shared
+        self.exclude = [os.path.normcase(os.path.abspath(x)) for x in exclude]
+        self.delay = delay
+        self.interval = interval if interval is not None else defs['watch.poll']  # Polling only, without inotify
+        self.idle = idle if idle is not None else defs['watch.idle']
+        self.halt = threading.Event()
+        self.backend = None
+
+    def stop(self):
+        """Stop watching."""
+        self.halt.set()
+        self.wake()
+
+    def wake(self):
+        """Interrupt a wait (a polling backend checks for changes at once)."""
+        if self.backend is not None: self.backend.interrupt()
+
+    def run(self):
+        """Collect changes until the burst settles, then report them once (inotify blocks while idle)."""
+        try: backend = inotifyWatch(self.root, self.exclude, self.engine)
+        except (OSError, AttributeError): backend = pollWatch(self.root, self.exclude, self.engine, self.halt, self.interval, self.idle)
+        self.backend = backend
+        pending, first, last = set(), 0, 0
+        try:
+            while not self.halt.is_set():
+                timeout = max(0.05, min(last+self.delay, first+self.delay*10)-time.monotonic()) if pending else None
+                changed = backend.wait(timeout)
+                now = time.monotonic()
+                if changed:
+                    if not pending: first = now
+                    pending |= changed
+                    last = now
+                if pending and (now-last >= self.delay or now-first >= self.delay*10):
+                    self.onChange(pending)
+                    pending = set()
+        finally: backend.close()
+
+
+class journalWatcher(threading.Thread):
+    """Report changes of the settings journal (by any instance)."""
+
+    def __init__(self, journal, onChange, interval=10.0):
+        """Init."""
+        threading.Thread.__init__(self, name='journalWatcher', daemon=True)
+        self.journal = journal
+        self.onChange = onChange
+        self.interval = interval  # Polling only, without inotify
+        self.halt = threading.Event()
+        try: self.backend = inotifyFile(journal.path)
+        except (OSError, AttributeError): self.backend = None
+
+    def stop(self):
+        """Stop watching."""
+        self.halt.set()
+        if self.backend is not None: self.backend.interrupt()
+
+    def run(self):
+        """Wait for journal writes (inotify, no wakeups while idle) or poll, reporting those of other instances."""
+        last = self.journal.stat()
+        try:
+            while not self.halt.is_set():
+                if self.backend is not None: self.backend.wait()
+                else: self.halt.wait(self.interval)
+                if self.halt.is_set(): break
+                state = self.journal.stat()
+                if state != last and state != (self.journal.ident, self.journal.pos): self.onChange()
+                last = state
+        finally:
+            if self.backend is not None: self.backend.close()